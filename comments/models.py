@@ -1,5 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from fitapi.cache import invalidate_tags
+from fitapi.counters import adjust_counter
 from workoutposts.models import WorkoutPost
 
 
@@ -11,5 +15,33 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], name='comment_created_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s comment on {self.post.workout.title}"
+
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(
+            WorkoutPost.objects.filter(pk=instance.post_id),
+            'comments_count', 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, **kwargs):
+    adjust_counter(
+        WorkoutPost.objects.filter(pk=instance.post_id), 'comments_count', -1
+    )
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_post_caches(sender, instance, **kwargs):
+    invalidate_tags(f'post:{instance.post_id}')
@@ -1,4 +1,6 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -40,3 +42,16 @@ class CommentTests(TestCase):
         )
         response = self.client.get('/api/comments/comments/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_comments_query_count_is_constant(self):
+        Comment.objects.create(user=self.user, post=self.post, content='First')
+        with CaptureQueriesContext(connection) as single:
+            self.client.get('/comments/comments/')
+        for i in range(4):
+            Comment.objects.create(
+                user=self.user, post=self.post, content=f'Comment {i}')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get('/comments/comments/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(len(many), len(single))
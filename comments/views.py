@@ -2,9 +2,12 @@ from rest_framework import generics
 from .models import Comment
 from .serializers import CommentSerializer
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from fitapi.projections import ProjectedListMixin
+from fitapi.query_plans import QueryPlanMixin
 
 
-class CommentList(generics.ListCreateAPIView):
+class CommentList(ProjectedListMixin, QueryPlanMixin,
+                  generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     queryset = Comment.objects.all().order_by('-created_at')
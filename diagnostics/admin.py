@@ -0,0 +1,44 @@
+import json
+from django.contrib import admin
+from django.utils.html import format_html, format_html_join
+from .models import SlowRequest
+
+
+@admin.register(SlowRequest)
+class SlowRequestAdmin(admin.ModelAdmin):
+    list_display = (
+        'created_at', 'method', 'path', 'view_name', 'status_code',
+        'duration_ms', 'query_count', 'db_ms',
+    )
+    list_filter = ('view_name', 'method', 'status_code')
+    search_fields = ('path', 'view_name')
+    exclude = ('queries',)
+    readonly_fields = (
+        'created_at', 'method', 'path', 'view_name', 'formatted_params',
+        'status_code', 'duration_ms', 'query_count', 'db_ms',
+        'slowest_queries',
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Query parameters')
+    def formatted_params(self, obj):
+        return format_html('<pre>{}</pre>', json.dumps(obj.query_params, indent=2))
+
+    @admin.display(description='Slowest statements')
+    def slowest_queries(self, obj):
+        return format_html_join(
+            '', '<h4>{} ms</h4><pre>{}</pre><p>Parameters: {}</p><pre>{}</pre>',
+            (
+                (
+                    query['duration_ms'], query['sql'],
+                    ', '.join(query['params']) or '-',
+                    query['plan'] or 'No plan (not a SELECT).',
+                )
+                for query in obj.queries
+            ),
+        )
@@ -0,0 +1,111 @@
+"""
+Capture of slow requests: the slowest statements of a request are kept
+while it runs, and explained and stored once it turns out to be slow.
+"""
+import heapq
+import itertools
+import time
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.views.debug import SafeExceptionReporterFilter
+from .models import SlowRequest
+
+
+class SlowestQueries:
+    """An ``execute_wrapper`` keeping the ``size`` slowest statements."""
+
+    def __init__(self, alias, size):
+        self.alias = alias
+        self.size = size
+        self.count = 0
+        self.total = 0.0
+        self.heap = []
+        self._order = itertools.count()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            entry = (duration, next(self._order), sql, params, many)
+            if len(self.heap) < self.size:
+                heapq.heappush(self.heap, entry)
+            elif duration > self.heap[0][0]:
+                heapq.heapreplace(self.heap, entry)
+
+    def slowest(self):
+        return [
+            {
+                'alias': self.alias,
+                'sql': sql,
+                'params': params,
+                'many': many,
+                'duration_ms': round(duration * 1000, 3),
+            }
+            for duration, _, sql, params, many in sorted(self.heap, reverse=True)
+        ]
+
+
+def is_select(sql):
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+def redact_query_params(query):
+    """
+    ``query`` (a ``QueryDict``) as lists, with the values of the keys
+    Django's error reports hide, such as tokens and keys, blanked out.
+    """
+    return {
+        key: (
+            [SafeExceptionReporterFilter.cleansed_substitute] * len(values)
+            if SafeExceptionReporterFilter.hidden_settings.search(key)
+            else values
+        )
+        for key, values in query.lists()
+    }
+
+
+def explain(alias, sql, params):
+    """The plan of a SELECT, or why there is none."""
+    if not is_select(sql):
+        return None
+    connection = connections[alias]
+    try:
+        # A savepoint, so a failed EXPLAIN cannot break an open transaction
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            cursor.execute(
+                f'{connection.ops.explain_query_prefix()} {sql}', params
+            )
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+
+
+def capture_slow_request(request_info, queries):
+    """
+    Explain the statements of a slow request and store it. Parameters are
+    only used to explain the statements unless ``SLOW_REQUEST_PARAMS`` is
+    on, and are never kept for writes, whose parameters are user data.
+    """
+    captured = []
+    for query in queries:
+        params = None if query['many'] else query['params']
+        kept = params if (
+            settings.SLOW_REQUEST_PARAMS and is_select(query['sql'])
+        ) else None
+        captured.append({
+            'sql': query['sql'],
+            'params': [repr(param) for param in kept or ()],
+            'duration_ms': query['duration_ms'],
+            'plan': None if query['many'] else explain(
+                query['alias'], query['sql'], params
+            ),
+        })
+    SlowRequest.objects.create(queries=captured, **request_info)
+    SlowRequest.trim()
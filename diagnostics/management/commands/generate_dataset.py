@@ -0,0 +1,209 @@
+import random
+from array import array
+from datetime import timedelta
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from comments.models import Comment
+from followers.models import Follower
+from likes.models import Like
+from profiles.models import Profile
+from workoutposts.models import WorkoutPost, post_search
+from workouts.models import Workout, workout_search
+
+WORDS = (
+    'easy', 'tempo', 'long', 'hill', 'interval', 'recovery', 'morning',
+    'evening', 'run', 'ride', 'swim', 'lift', 'yoga', 'stretch', 'match',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset for benchmarking, inserting rows with "
+        "bulk_create. Signals are bypassed, so counters, statistics "
+        "rollups and the search index are rebuilt once at the end. Home "
+        "feed timelines are not generated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--workouts', type=int, default=50000)
+        parser.add_argument(
+            '--posts', type=int, default=10000,
+            help="At most one post per workout.",
+        )
+        parser.add_argument('--likes', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--follow-exponent', type=float, default=1.1,
+            help="Zipf exponent of the follower graph; users are followed "
+                 "in proportion to 1 / rank ** exponent.",
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Random seed, so a dataset can be regenerated exactly.",
+        )
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help="Username prefix of the generated users.",
+        )
+
+    def handle(self, *args, **options):
+        if options['posts'] > options['workouts']:
+            raise CommandError("--posts cannot exceed --workouts.")
+        if User.objects.filter(
+            username__startswith=f"{options['prefix']}-"
+        ).exists():
+            raise CommandError(
+                f"Users prefixed {options['prefix']!r} already exist; "
+                f"pick another --prefix."
+            )
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+
+        user_ids = self.create_users(options['users'], options['prefix'])
+        post_ids = self.create_workouts_and_posts(
+            user_ids, options['workouts'], options['posts']
+        )
+        self.create_pairs(
+            Follower, 'follower_id', 'followed_id', options['follows'],
+            user_ids, self.power_law(user_ids, options['follow_exponent']),
+            allow_self=False,
+        )
+        self.create_pairs(
+            Like, 'owner_id', 'post_id', options['likes'],
+            user_ids, lambda: self.random.choice(post_ids),
+        )
+        self.create_comments(user_ids, post_ids, options['comments'])
+        self.rebuild_derived_data(user_ids)
+
+    def create_users(self, count, prefix):
+        # Users without a usable password, so no password hashing is done
+        password = make_password(None)
+        user_ids = array('q')
+        for start in range(0, count, self.batch_size):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{prefix}-{n}', password=password)
+                    for n in range(start, min(start + self.batch_size, count))
+                ])
+                # bulk_create skips the create_profile signal
+                Profile.objects.bulk_create([
+                    Profile(owner=user) for user in users
+                ])
+            user_ids.extend(user.pk for user in users)
+        self.stdout.write(f"{len(user_ids)} user(s) created.")
+        return user_ids
+
+    def create_workouts_and_posts(self, user_ids, count, posts):
+        today = timezone.localdate()
+        post_ids = array('q')
+        for start in range(0, count, self.batch_size):
+            numbers = range(start, min(start + self.batch_size, count))
+            with transaction.atomic():
+                workouts = Workout.objects.bulk_create([
+                    Workout(
+                        owner_id=self.random.choice(user_ids),
+                        title=' '.join(self.random.sample(WORDS, 2)).title(),
+                        workout_type=self.random.choice(Workout.WORKOUT_TYPES)[0],
+                        intensity=self.random.choice(Workout.INTENSITY_LEVELS)[0],
+                        duration=self.random.randint(10, 180),
+                        date_logged=today - timedelta(
+                            days=self.random.randint(0, 730)
+                        ),
+                    )
+                    for n in numbers
+                ])
+                # Spread the posts evenly over the workouts
+                created = WorkoutPost.objects.bulk_create([
+                    WorkoutPost(
+                        owner_id=workout.owner_id, workout=workout,
+                        content=f'{workout.title}: felt {self.random.choice(WORDS)}',
+                    )
+                    for n, workout in zip(numbers, workouts)
+                    if n * posts // count != (n + 1) * posts // count
+                ])
+            post_ids.extend(post.pk for post in created)
+        self.stdout.write(
+            f"{count} workout(s) and {len(post_ids)} post(s) created."
+        )
+        return post_ids
+
+    def power_law(self, user_ids, exponent):
+        """A picker of users favouring low ranks, Zipf-style."""
+        ranked = list(user_ids)
+        self.random.shuffle(ranked)
+        weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(ranked) + 1)
+        ))
+        return lambda: self.random.choices(ranked, cum_weights=weights)[0]
+
+    def create_pairs(self, model, owner_field, target_field, count,
+                     user_ids, pick_target, allow_self=True):
+        """
+        ``count`` rows of a model unique on (owner, target). Duplicate
+        draws (and, unless ``allow_self``, self-pairs) are dropped, so
+        slightly fewer rows may be created.
+        """
+        for start in range(0, count, self.batch_size):
+            pairs = {
+                (self.random.choice(user_ids), pick_target())
+                for _ in range(min(self.batch_size, count - start))
+            }
+            model.objects.bulk_create(
+                [
+                    model(**{owner_field: owner, target_field: target})
+                    for owner, target in pairs
+                    if allow_self or owner != target
+                ],
+                ignore_conflicts=True,
+            )
+        # Only generated users own rows under the fresh prefix
+        owner = model._meta.get_field(owner_field.removesuffix('_id')).name
+        created = model.objects.filter(**{
+            f'{owner}__username__startswith': f'{self.prefix}-'
+        }).count()
+        self.stdout.write(
+            f"{created} {model._meta.verbose_name_plural} created."
+        )
+
+    def create_comments(self, user_ids, post_ids, count):
+        for start in range(0, count, self.batch_size):
+            Comment.objects.bulk_create([
+                Comment(
+                    user_id=self.random.choice(user_ids),
+                    post_id=self.random.choice(post_ids),
+                    content=' '.join(self.random.sample(WORDS, 3)),
+                )
+                for _ in range(min(self.batch_size, count - start))
+            ])
+        self.stdout.write(f"{count} comment(s) created.")
+
+    def rebuild_derived_data(self, user_ids):
+        # Only the generated users' rows were inserted around the signals
+        for command in (
+            'recount_profile_counters', 'reconcile_post_counters',
+            'rebuild_workout_stats',
+        ):
+            call_command(command, user_ids=list(user_ids), stdout=self.stdout)
+        for model, index in (
+            (Workout, workout_search), (WorkoutPost, post_search)
+        ):
+            pks = model.objects.filter(
+                owner__username__startswith=f'{self.prefix}-'
+            ).values_list('pk', flat=True).iterator(chunk_size=self.batch_size)
+            batch = []
+            for pk in pks:
+                batch.append(pk)
+                if len(batch) == self.batch_size:
+                    index.refresh(batch)
+                    batch = []
+            index.refresh(batch)
+        self.stdout.write(self.style.SUCCESS("Dataset generated."))
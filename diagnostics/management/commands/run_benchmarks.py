@@ -0,0 +1,216 @@
+import json
+import math
+import platform
+import subprocess
+import time
+import tracemalloc
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from comments.models import Comment
+from followers.models import Follower
+from likes.models import Like
+from profiles.models import Profile
+from workoutposts.models import WorkoutPost
+from workouts.models import Workout
+
+# label: (URL name or path, URL kwargs built from the benchmark user, params)
+ENDPOINTS = {
+    'WorkoutList': ('workout-list', None, {}),
+    'WorkoutDetail': ('workout-detail', lambda user: {
+        'pk': Workout.objects.filter(owner=user).values_list(
+            'pk', flat=True).first(),
+    }, {}),
+    'WorkoutSearch': ('workout-search', None, {'q': 'run'}),
+    'workout_statistics': ('workout-statistics', None, {}),
+    'workout_statistics_trends': (
+        'workout-statistics', None, {'granularity': 'week'}),
+    'WorkoutPostList': ('workoutpost-list', None, {}),
+    'WorkoutPostSearch': ('workoutpost-search', None, {'q': 'run'}),
+    'HomeFeed': ('workoutpost-feed', None, {}),
+    'ProfileList': ('profile-list', None, {}),
+    'CurrentUserProfile': ('current-user-profile', None, {}),
+    'ProfileDetail': ('profile-detail', lambda user: {'owner': user.pk}, {}),
+    'profile_statistics': (
+        'profile-statistics', lambda user: {'owner': user.pk}, {}),
+    'CommentList': ('comment-list', None, {}),
+    'LikeList': ('like-list', None, {}),
+    'FollowerListView': ('/followers/followers/', None, {}),
+}
+
+DATASET_MODELS = {
+    'users': User, 'workouts': Workout, 'posts': WorkoutPost,
+    'likes': Like, 'comments': Comment, 'follows': Follower,
+}
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the API views in-process through the test client and "
+        "report latency percentiles, query counts and peak memory as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--user',
+            help="Username to benchmark as; defaults to the user following "
+                 "the most people, whose feed is the largest.",
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            choices=sorted(ENDPOINTS),
+            help="Only run this endpoint (may be repeated).",
+        )
+        parser.add_argument(
+            '--cold-cache', action='store_true',
+            help="Clear the cache before every request.",
+        )
+        parser.add_argument('--output', help="Write the JSON report here.")
+        parser.add_argument(
+            '--baseline',
+            help="A previous report to compare latencies against.",
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        user = self.benchmark_user(options['user'])
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(user=user)
+        self.cold_cache = options['cold_cache']
+
+        results = {}
+        for label in options['endpoints'] or ENDPOINTS:
+            target, kwargs, params = ENDPOINTS[label]
+            url = target if target.startswith('/') else reverse(
+                target, kwargs=kwargs(user) if kwargs else None
+            )
+            results[label] = self.measure(
+                client, url, params, options['iterations'], options['warmup']
+            )
+
+        report = {
+            'commit': current_commit(),
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                name: model.objects.count()
+                for name, model in DATASET_MODELS.items()
+            },
+            'options': {
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'cold_cache': self.cold_cache,
+                'user': user.username,
+            },
+            'results': results,
+        }
+        if options['baseline']:
+            self.compare(report, options['baseline'])
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                handle.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def benchmark_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {username!r}.")
+        profile = Profile.objects.order_by('-following_count', 'pk').first()
+        if profile is None:
+            raise CommandError(
+                "There is no data to benchmark; run generate_dataset first."
+            )
+        return profile.owner
+
+    def request(self, client, url, params):
+        if self.cold_cache:
+            cache.clear()
+        return client.get(url, params)
+
+    def measure(self, client, url, params, iterations, warmup):
+        for _ in range(warmup):
+            self.request(client, url, params)
+
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            response = self.request(client, url, params)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        # Counting queries and tracing memory slow requests down, so they
+        # get runs of their own. The query log is reset whenever a request
+        # starts, so it is counted before the next one.
+        with CaptureQueriesContext(connection) as queries:
+            self.request(client, url, params)
+        query_count = len(queries)
+        tracemalloc.start()
+        try:
+            self.request(client, url, params)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': query_count,
+            'peak_memory_kib': round(peak / 1024, 1),
+        }
+
+    def compare(self, report, path):
+        """Add each endpoint's p50 relative to the baseline report."""
+        with open(path) as handle:
+            baseline = json.load(handle)
+        report['baseline'] = {
+            'commit': baseline.get('commit'),
+            'same_dataset': baseline.get('dataset') == report['dataset'],
+        }
+        if not report['baseline']['same_dataset']:
+            self.stderr.write(
+                "The baseline was run against a different dataset; "
+                "latencies are not comparable."
+            )
+        for label, result in report['results'].items():
+            previous = baseline.get('results', {}).get(label)
+            if previous and previous['p50_ms']:
+                result['p50_vs_baseline'] = round(
+                    result['p50_ms'] / previous['p50_ms'], 3
+                )
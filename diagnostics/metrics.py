@@ -0,0 +1,370 @@
+"""
+An in-process metrics registry rendered in the Prometheus text format.
+
+Every thread records into a shard of its own, so recording takes no lock;
+shards are only summed when the metrics are scraped. With a multiprocess
+directory configured, each shard is a memory-mapped file in it and a
+scrape sums the shards of every process, which is how the gunicorn
+workers' metrics are aggregated. ``gunicorn.conf.py`` empties the
+directory when the server starts and folds the files of each exited
+worker into one archive shard, which keeps counters from going backwards
+without keeping a file per worker ever started.
+"""
+import bisect
+import itertools
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from django.conf import settings
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Shard file layout: the number of bytes in use, then entries of a key
+# length, a slot count, the JSON key padded to 8 bytes and the slots.
+_USED = struct.Struct('<Q')
+_ENTRY = struct.Struct('<II')
+_SLOT = struct.Struct('<d')
+_INITIAL_FILE_SIZE = 64 * 1024
+ARCHIVE_NAME = 'archive.db'
+
+
+class MemoryShard:
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.series = {}
+
+    def slots(self, key, size):
+        values = self.series.get(key)
+        if values is None:
+            values = self.series[key] = [0.0] * size
+        return values
+
+    def add(self, key, size, slot, amount):
+        self.slots(key, size)[slot] += amount
+
+    def items(self):
+        return [(key, list(values)) for key, values in list(self.series.items())]
+
+
+class FileShard:
+    """A shard stored in a memory-mapped file, readable by other processes."""
+
+    def __init__(self, path):
+        self.thread = threading.current_thread()
+        self.path = path
+        self.offsets = {}
+        fd = os.open(path, os.O_RDWR | os.O_CREAT)
+        try:
+            if os.fstat(fd).st_size == 0:
+                os.ftruncate(fd, _INITIAL_FILE_SIZE)
+            self.map = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        self.used = _USED.unpack_from(self.map, 0)[0] or _USED.size
+        for key, offset, _ in _entries(self.map, self.used):
+            self.offsets[key] = offset
+
+    def slots(self, key, size):
+        offset = self.offsets.get(key)
+        if offset is None:
+            offset = self._allocate(key, size)
+        return offset
+
+    def _allocate(self, key, size):
+        encoded = json.dumps(key).encode()
+        header = _ENTRY.size + len(encoded)
+        header += -header % 8
+        end = self.used + header + size * _SLOT.size
+        if end > len(self.map):
+            self._grow(end)
+        _ENTRY.pack_into(self.map, self.used, len(encoded), size)
+        self.map[self.used + _ENTRY.size:self.used + _ENTRY.size + len(encoded)] = encoded
+        offset = self.used + header
+        # Readers only look as far as the recorded size, so the entry is
+        # complete before it is published
+        self.used = end
+        _USED.pack_into(self.map, 0, self.used)
+        self.offsets[key] = offset
+        return offset
+
+    def _grow(self, needed):
+        size = len(self.map)
+        while size < needed:
+            size *= 2
+        self.map.close()
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+
+    def add(self, key, size, slot, amount):
+        offset = self.slots(key, size) + slot * _SLOT.size
+        _SLOT.pack_into(
+            self.map, offset, _SLOT.unpack_from(self.map, offset)[0] + amount
+        )
+
+    def items(self):
+        return [
+            (key, [
+                _SLOT.unpack_from(self.map, offset + n * _SLOT.size)[0]
+                for n in range(size)
+            ])
+            for key, offset, size in _entries(self.map, self.used)
+        ]
+
+
+def _entries(buffer, used):
+    """The ``(key, slots offset, slot count)`` of each entry of a shard."""
+    position = _USED.size
+    while position < used:
+        length, size = _ENTRY.unpack_from(buffer, position)
+        start = position + _ENTRY.size
+        key = json.loads(bytes(buffer[start:start + length]))
+        header = _ENTRY.size + length
+        header += -header % 8
+        offset = position + header
+        yield (key[0], tuple(key[1])), offset, size
+        position = offset + size * _SLOT.size
+
+
+def _read_shard_file(path):
+    try:
+        with open(path, 'rb') as handle:
+            data = handle.read()
+    except FileNotFoundError:
+        # Folded into the archive since the directory was listed
+        return []
+    if len(data) < _USED.size:
+        return []
+    used = min(_USED.unpack_from(data, 0)[0], len(data))
+    return [
+        (key, [
+            _SLOT.unpack_from(data, offset + n * _SLOT.size)[0]
+            for n in range(size)
+        ])
+        for key, offset, size in _entries(data, used)
+    ]
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, registry, name, documentation, labels):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.size = 1
+
+    def inc(self, labels, amount=1):
+        """Add ``amount`` to the series of ``labels``, a tuple of values."""
+        self.registry.shard().add((self.name, labels), 1, 0, amount)
+
+    def samples(self, labels, slots):
+        yield self.name, labels, slots[0]
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels,
+                 buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # A count per bucket, then +Inf, then the sum of the observations
+        self.size = len(self.buckets) + 2
+
+    def observe(self, labels, value):
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        shard.add(key, self.size, bisect.bisect_left(self.buckets, value), 1)
+        shard.add(key, self.size, self.size - 1, value)
+
+    def samples(self, labels, slots):
+        cumulative = 0
+        bounds = [*self.buckets, math.inf]
+        for bound, count in zip(bounds, slots):
+            cumulative += count
+            le = '+Inf' if bound == math.inf else repr(float(bound))
+            yield f'{self.name}_bucket', labels + (('le', le),), cumulative
+        yield f'{self.name}_sum', labels, slots[-1]
+        yield f'{self.name}_count', labels, cumulative
+
+
+class Registry:
+    """
+    Metric definitions plus the shards recording them. ``directory``
+    switches on the multiprocess mode; by default it is read from the
+    ``METRICS_MULTIPROC_DIR`` setting when the first shard is made.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.metrics = {}
+        self._local = threading.local()
+        self._shards = []
+        self._retired = MemoryShard()
+        self._numbers = itertools.count()
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labels):
+        return self._register(Counter(self, name, documentation, labels))
+
+    def histogram(self, name, documentation, labels, buckets=DEFAULT_BUCKETS):
+        return self._register(
+            Histogram(self, name, documentation, labels, buckets)
+        )
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._new_shard()
+
+    def _new_shard(self):
+        # Once per thread, so the lock is off the request path
+        with self._lock:
+            if self.directory is None:
+                self.directory = settings.METRICS_MULTIPROC_DIR or ''
+            if self.directory:
+                # A threaded server starts threads without end, so the file
+                # of a finished thread is handed on rather than adding more
+                shard = next(
+                    (s for s in self._shards if not s.thread.is_alive()), None
+                )
+                if shard is None:
+                    shard = FileShard(os.path.join(
+                        self.directory,
+                        f'{os.getpid()}-{next(self._numbers)}.db',
+                    ))
+                    self._shards.append(shard)
+                shard.thread = threading.current_thread()
+            else:
+                shard = MemoryShard()
+                self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def _memory_series(self):
+        with self._lock:
+            # Shards of finished threads will not change again, so they
+            # are folded into one rather than kept forever
+            for shard in [s for s in self._shards if not s.thread.is_alive()]:
+                for key, values in shard.items():
+                    retired = self._retired.slots(key, len(values))
+                    for n, value in enumerate(values):
+                        retired[n] += value
+                self._shards.remove(shard)
+            shards = [self._retired, *self._shards]
+        for shard in shards:
+            yield from shard.items()
+
+    def _file_series(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.db'):
+                yield from _read_shard_file(os.path.join(self.directory, name))
+
+    def collect(self):
+        """The series of every metric summed across shards, by metric."""
+        series = self._file_series() if self.directory else self._memory_series()
+        totals = {}
+        for (name, labels), values in series:
+            if name not in self.metrics:
+                continue
+            current = totals.setdefault(name, {}).get(labels)
+            if current is None:
+                totals[name][labels] = list(values)
+            else:
+                for n, value in enumerate(values):
+                    current[n] += value
+        return totals
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        totals = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for labels, slots in sorted(totals.get(name, {}).items()):
+                pairs = tuple(zip(metric.labels, labels))
+                for sample, sample_labels, value in metric.samples(pairs, slots):
+                    lines.append(
+                        f'{sample}{_format_labels(sample_labels)} '
+                        f'{_format_value(value)}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+def fold_process(directory, pid):
+    """
+    Add the shards of the exited process ``pid`` into the archive shard of
+    ``directory`` and remove them. The archive is rewritten aside and
+    swapped in whole, so a scrape never reads one half written.
+    """
+    prefix = f'{pid}-'
+    names = [
+        name for name in os.listdir(directory)
+        if name.startswith(prefix) and name.endswith('.db')
+    ]
+    if not names:
+        return
+    archive = os.path.join(directory, ARCHIVE_NAME)
+    pending = archive + '.tmp'
+    if os.path.exists(pending):
+        os.unlink(pending)
+    shard = FileShard(pending)
+    for name in [ARCHIVE_NAME, *names]:
+        for key, values in _read_shard_file(os.path.join(directory, name)):
+            for n, value in enumerate(values):
+                shard.add(key, len(values), n, value)
+    shard.map.flush()
+    shard.map.close()
+    os.replace(pending, archive)
+    for name in names:
+        os.unlink(os.path.join(directory, name))
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'),
+        )
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests handled.',
+    ('view', 'method', 'status'),
+)
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Time taken to handle HTTP requests.',
+    ('view', 'method', 'status'),
+)
@@ -0,0 +1,205 @@
+import logging
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .nplusone import NPlusOneError, QueryCounter
+from fitapi.tasks import run_after_commit
+from .capture import SlowestQueries, capture_slow_request, redact_query_params
+from .metrics import REQUEST_DURATION, REQUESTS
+from .timing import instrument_serializers, timing_request
+
+logger = logging.getLogger('diagnostics.timing')
+nplusone_logger = logging.getLogger('diagnostics.nplusone')
+
+METHODS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class MetricsMiddleware:
+    """
+    Counts requests and observes their latency, labelled with the name of
+    the URL pattern that handled them, the method and the status code.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+        labels = (
+            self.view_label(request.resolver_match),
+            request.method if request.method in METHODS else 'other',
+            str(response.status_code),
+        )
+        REQUESTS.inc(labels)
+        REQUEST_DURATION.observe(labels, duration)
+        return response
+
+    def view_label(self, match):
+        # Unnamed patterns fall back to their route, and unresolved paths
+        # share a label, so a scan of random URLs cannot add series (nor
+        # can made-up methods)
+        if match is None:
+            return '<unmatched>'
+        return match.url_name or match.route or '<unnamed>'
+
+
+class ServerTimingMiddleware:
+    """
+    Times a sample of requests (``SERVER_TIMING_SAMPLE_RATE``) and reports
+    their query count, database, serializer, view and total times in a
+    ``Server-Timing`` header and a log line.
+
+    The view time runs from URL resolution to the rendered response, so
+    it includes the database and serializer times.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SERVER_TIMING_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        instrument_serializers()
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with timing_request() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timings.record_query)
+                )
+            request._view_started = None
+            response = self.get_response(request)
+            finished = time.perf_counter()
+            if request._view_started is not None:
+                timings.add('view', finished - request._view_started)
+            timings.add('total', finished - start)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings.milliseconds("db")};desc="{timings.queries} queries"',
+            f'serialize;dur={timings.milliseconds("serialize")}',
+            f'view;dur={timings.milliseconds("view")}',
+            f'total;dur={timings.milliseconds("total")}',
+        ])
+        self.log(request, response, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_view_started'):
+            request._view_started = time.perf_counter()
+
+    def log(self, request, response, timings):
+        match = request.resolver_match
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'db_queries': timings.queries,
+            'db_ms': timings.milliseconds('db'),
+            'serialize_ms': timings.milliseconds('serialize'),
+            'view_ms': timings.milliseconds('view'),
+            'total_ms': timings.milliseconds('total'),
+        }
+        logger.info(
+            ' '.join(f'{name}={value}' for name, value in fields.items()),
+            extra={'timing': fields},
+        )
+
+
+class NPlusOneMiddleware:
+    """
+    Flags SQL statements that run more than ``NPLUSONE_THRESHOLD`` times
+    in one request, with the serializer field and line of project code
+    that ran them; logged, or raised as ``NPlusOneError`` when
+    ``NPLUSONE_RAISE`` is on. Without a threshold the middleware is
+    removed from the stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.NPLUSONE_THRESHOLD
+        if not self.threshold:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        counter = QueryCounter(self.threshold)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        repeated = counter.repeated()
+        if repeated:
+            self.report(request, repeated)
+        return response
+
+    def report(self, request, repeated):
+        lines = [
+            f'{count}x {sql}\n    field: {field or "-"}\n    from: {line or "-"}'
+            for sql, count, field, line in repeated
+        ]
+        message = (
+            f'{request.method} {request.path} repeated {len(repeated)} '
+            f'statement(s):\n' + '\n'.join(lines)
+        )
+        if settings.NPLUSONE_RAISE:
+            raise NPlusOneError(message)
+        nplusone_logger.warning(message)
+
+
+class SlowRequestMiddleware:
+    """
+    Stores requests slower than ``SLOW_REQUEST_THRESHOLD_MS`` as
+    ``SlowRequest`` rows, with their view, query parameters (sensitive ones
+    redacted) and the ``SLOW_REQUEST_QUERIES`` slowest statements and their
+    plans. Only the slowest statements are kept while a request runs;
+    explaining and storing them happens after the response, in the
+    background.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = settings.SLOW_REQUEST_THRESHOLD_MS
+        if not self.threshold:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        recorders = []
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                recorder = SlowestQueries(
+                    connection.alias, settings.SLOW_REQUEST_QUERIES
+                )
+                recorders.append(recorder)
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = (time.perf_counter() - start) * 1000
+
+        if duration > self.threshold:
+            match = request.resolver_match
+            queries = sorted(
+                (query for recorder in recorders for query in recorder.slowest()),
+                key=lambda query: query['duration_ms'], reverse=True,
+            )[:settings.SLOW_REQUEST_QUERIES]
+            run_after_commit(capture_slow_request, {
+                'method': request.method,
+                'path': request.path[:2000],
+                'view_name': match.view_name if match else '',
+                'query_params': redact_query_params(request.GET),
+                'status_code': response.status_code,
+                'duration_ms': round(duration, 3),
+                'query_count': sum(recorder.count for recorder in recorders),
+                'db_ms': round(
+                    sum(recorder.total for recorder in recorders) * 1000, 3
+                ),
+            }, queries)
+        return response
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import models
+
+
+class SlowRequest(models.Model):
+    """
+    A request that took longer than ``SLOW_REQUEST_THRESHOLD_MS``, with
+    its slowest statements and their plans. Only the newest
+    ``SLOW_REQUEST_CAPTURES`` are kept.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    view_name = models.CharField(max_length=200, blank=True)
+    query_params = models.JSONField(default=dict)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    db_ms = models.FloatField()
+    # [{"sql", "params", "duration_ms", "plan"}], slowest first
+    queries = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
+
+    @classmethod
+    def trim(cls, keep=None):
+        """Drop all but the newest ``keep`` captures."""
+        keep = settings.SLOW_REQUEST_CAPTURES if keep is None else keep
+        cutoff = cls.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        )[keep:keep + 1]
+        if cutoff:
+            cls.objects.filter(pk__lte=cutoff[0]).delete()
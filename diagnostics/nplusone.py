@@ -0,0 +1,86 @@
+"""
+Detection of N+1 queries: the same statement, parameters aside, run over
+and over within one request, typically once per serialized row.
+"""
+import functools
+import os
+import re
+import sys
+from django.conf import settings
+from rest_framework import serializers
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+_SERIALIZER_CODE = serializers.Serializer.to_representation.__code__
+# The detector's own frames are never the origin of a query
+_OWN_FILES = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('nplusone.py', 'middleware.py')
+}
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """``sql`` with literals, placeholders and their lists normalized."""
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _LISTS.sub('(...)', sql.replace('%s', '?'))
+    return _SPACE.sub(' ', sql).strip()
+
+
+def attribute(frame):
+    """
+    Where the query at ``frame`` came from: the serializer field being
+    rendered, if any, and the innermost line of project code.
+    """
+    field = line = None
+    base = str(settings.BASE_DIR) + os.sep
+    while frame is not None and (field is None or line is None):
+        code = frame.f_code
+        if field is None and code is _SERIALIZER_CODE:
+            serializer = frame.f_locals.get('self')
+            current = frame.f_locals.get('field')
+            if current is not None:
+                field = f'{type(serializer).__name__}.{current.field_name}'
+        elif (
+            line is None and code.co_filename.startswith(base)
+            and code.co_filename not in _OWN_FILES
+            and 'site-packages' not in code.co_filename
+        ):
+            line = (
+                f'{os.path.relpath(code.co_filename, base)}:'
+                f'{frame.f_lineno} in {code.co_name}'
+            )
+        frame = frame.f_back
+    return field, line
+
+
+class QueryCounter:
+    """An ``execute_wrapper`` counting the fingerprints of a request."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = {}
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        count = self.counts[key] = self.counts.get(key, 0) + 1
+        # The stack is only walked once a statement crosses the threshold
+        if count == self.threshold + 1:
+            self.origins[key] = attribute(sys._getframe(1))
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """``(fingerprint, count, field, line)`` of each repeated statement."""
+        return [
+            (key, self.counts[key], *origin)
+            for key, origin in self.origins.items()
+        ]
@@ -0,0 +1,372 @@
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from followers.models import Follower
+from likes.models import Like
+from profiles.models import Profile
+from workoutposts.models import WorkoutPost
+from workouts.models import Workout, WorkoutStats
+from .metrics import Registry, fold_process
+from .models import SlowRequest
+from .middleware import NPlusOneMiddleware
+from .nplusone import NPlusOneError, QueryCounter, fingerprint
+from .timing import current_timings, timed
+
+
+class BenchmarkCommandTests(TestCase):
+    def generate(self, **options):
+        defaults = dict(
+            users=8, workouts=60, posts=15, likes=40, comments=10,
+            follows=30, batch_size=16, seed=1,
+        )
+        defaults.update(options)
+        call_command('generate_dataset', stdout=StringIO(), **defaults)
+
+    def test_generate_dataset(self):
+        """Test the generator bulk-inserts a consistent dataset"""
+        existing = User.objects.create_user(username='existing')
+        Profile.objects.filter(owner=existing).update(posts_count=5)
+        self.generate()
+        self.assertEqual(User.objects.count(), 9)
+        self.assertEqual(Profile.objects.count(), 9)
+        # Rows it did not generate are left as they were
+        self.assertEqual(Profile.objects.get(owner=existing).posts_count, 5)
+        self.assertEqual(Workout.objects.count(), 60)
+        self.assertEqual(WorkoutPost.objects.count(), 15)
+        self.assertGreater(Like.objects.count(), 0)
+        self.assertFalse(
+            Follower.objects.filter(follower=F('followed')).exists()
+        )
+
+        profile = Profile.objects.annotate(
+            posts=Count('owner__workout_posts', distinct=True)
+        ).order_by('-posts').first()
+        self.assertEqual(profile.posts_count, profile.posts)
+        self.assertEqual(
+            sum(WorkoutStats.objects.values_list('total_workouts', flat=True)),
+            60
+        )
+
+    def test_run_benchmarks_reports_json(self):
+        """Test the runner reports percentiles and query counts per view"""
+        self.generate()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'run_benchmarks', iterations=3, warmup=1, output=path,
+                endpoints=['WorkoutList', 'profile_statistics'],
+            )
+            call_command(
+                'run_benchmarks', iterations=3, warmup=0, baseline=path,
+                endpoints=['WorkoutList'], stdout=(out := StringIO()),
+            )
+            with open(path) as handle:
+                report = json.load(handle)
+
+        self.assertEqual(report['dataset']['workouts'], 60)
+        result = report['results']['WorkoutList']
+        self.assertEqual(result['status'], 200)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreater(result['queries'], 0)
+        self.assertGreater(result['peak_memory_kib'], 0)
+        compared = json.loads(out.getvalue())
+        self.assertTrue(compared['baseline']['same_dataset'])
+        self.assertIn('p50_vs_baseline', compared['results']['WorkoutList'])
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='timed', password='pass')
+        Workout.objects.create(
+            owner=self.user, title='Run', workout_type='cardio',
+            intensity='moderate', duration=30, date_logged='2024-01-01',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def timings(self, response):
+        return {
+            part.split(';')[0]: part for part in
+            response['Server-Timing'].split(', ')
+        }
+
+    def test_sampled_request_reports_timings(self):
+        """Test a sampled request gets a Server-Timing header and a log line"""
+        with self.assertLogs('diagnostics.timing', 'INFO') as logs:
+            response = self.client.get('/workouts/')
+        self.assertEqual(response.status_code, 200)
+        timings = self.timings(response)
+        self.assertEqual(
+            set(timings), {'db', 'serialize', 'view', 'total'}
+        )
+        self.assertIn('desc="', timings['db'])
+        self.assertNotIn('serialize;dur=0.0,', response['Server-Timing'])
+        self.assertIn('view=workout-list status=200', logs.output[0])
+        fields = logs.records[0].timing
+        self.assertGreater(fields['db_queries'], 0)
+        self.assertLessEqual(fields['db_ms'], fields['view_ms'])
+        self.assertLessEqual(fields['view_ms'], fields['total_ms'])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_disabled_sampling(self):
+        """Test a zero sample rate leaves responses untouched"""
+        response = self.client.get('/workouts/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_timed_outside_request(self):
+        """Test timed blocks are free outside a sampled request"""
+        with timed('serialize'):
+            self.assertIsNone(current_timings())
+
+
+class MetricsTests(TestCase):
+    def record(self, registry):
+        requests = registry.counter('requests_total', 'Requests.', ('view',))
+        latency = registry.histogram(
+            'latency_seconds', 'Latency.', ('view',), buckets=(0.1, 1)
+        )
+        requests.inc(('workout-list',))
+        latency.observe(('workout-list',), 0.05)
+        latency.observe(('workout-list',), 0.5)
+        return requests, latency
+
+    def test_render_prometheus_text(self):
+        """Test counters and cumulative histogram buckets are rendered"""
+        registry = Registry(directory='')
+        self.record(registry)
+        text = registry.render()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{view="workout-list"} 1\n', text)
+        self.assertIn(
+            'latency_seconds_bucket{view="workout-list",le="0.1"} 1\n', text
+        )
+        self.assertIn(
+            'latency_seconds_bucket{view="workout-list",le="+Inf"} 2\n', text
+        )
+        self.assertIn('latency_seconds_sum{view="workout-list"} 0.55\n', text)
+        self.assertIn('latency_seconds_count{view="workout-list"} 2\n', text)
+
+    def test_threads_record_into_their_own_shards(self):
+        """Test finished threads' counts survive being folded together"""
+        registry = Registry(directory='')
+        requests, _ = self.record(registry)
+        threads = [
+            threading.Thread(target=requests.inc, args=(('workout-list',),))
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for _ in range(2):
+            self.assertIn(
+                'requests_total{view="workout-list"} 4\n', registry.render()
+            )
+
+    def test_multiprocess_files_are_summed(self):
+        """Test registries sharing a directory scrape each other's series"""
+        with tempfile.TemporaryDirectory() as directory:
+            worker = Registry(directory=directory)
+            self.record(worker)
+            # Enough series to outgrow the initial file
+            for n in range(2000):
+                worker.metrics['requests_total'].inc((f'view-{n}',))
+            scraper = Registry(directory=directory)
+            self.record(scraper)
+            text = scraper.render()
+        self.assertIn('requests_total{view="workout-list"} 2\n', text)
+        self.assertIn('requests_total{view="view-1999"} 1\n', text)
+        self.assertIn('latency_seconds_count{view="workout-list"} 4\n', text)
+
+    def test_exited_workers_are_folded(self):
+        """Test finished threads reuse files and exited workers fold away"""
+        with tempfile.TemporaryDirectory() as directory:
+            worker = Registry(directory=directory)
+            requests, _ = self.record(worker)
+            for _ in range(3):
+                thread = threading.Thread(
+                    target=requests.inc, args=(('workout-list',),)
+                )
+                thread.start()
+                thread.join()
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+            fold_process(directory, os.getpid())
+            self.assertEqual(os.listdir(directory), ['archive.db'])
+            # A later worker's files are added to the archive
+            self.record(Registry(directory=directory))
+            fold_process(directory, os.getpid())
+            self.assertEqual(os.listdir(directory), ['archive.db'])
+            scraper = Registry(directory=directory)
+            scraper.metrics = worker.metrics
+            text = scraper.render()
+        self.assertIn('requests_total{view="workout-list"} 5\n', text)
+        self.assertIn('latency_seconds_count{view="workout-list"} 4\n', text)
+
+    def test_metrics_endpoint(self):
+        """Test requests are counted by URL name and scraped as text"""
+        root = self.client.get('/')
+        self.client.get('/no-such-page/')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn(
+            f'view="root",method="GET",status="{root.status_code}"', text
+        )
+        self.assertIn('view="<unmatched>",method="GET",status="404"', text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """Test the endpoint requires the bearer token once one is set"""
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+        response = self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class OwnerNameSerializer(serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source='owner.username')
+
+    class Meta:
+        model = Workout
+        fields = ['owner']
+
+
+class NPlusOneTests(TestCase):
+    def setUp(self):
+        for n in range(4):
+            user = User.objects.create_user(username=f'lifter{n}')
+            Workout.objects.create(
+                owner=user, title='Lift', workout_type='strength',
+                duration=30, date_logged='2024-01-01',
+            )
+
+    def test_fingerprint_strips_parameters(self):
+        """Test statements differing only in parameters share a fingerprint"""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a'"),
+            fingerprint("SELECT *  FROM t WHERE id = 22 AND name = 'b''c'"),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_attributes_repeats_to_serializer_field(self):
+        """Test a repeated lookup is traced to its field and line"""
+        counter = QueryCounter(threshold=2)
+        with connection.execute_wrapper(counter):
+            OwnerNameSerializer(Workout.objects.all(), many=True).data
+        [(sql, count, field, line)] = counter.repeated()
+        self.assertIn('auth_user', sql)
+        self.assertEqual(count, 4)
+        self.assertEqual(field, 'OwnerNameSerializer.owner')
+        self.assertTrue(line.startswith('diagnostics/tests.py:'))
+
+    @override_settings(NPLUSONE_THRESHOLD=2)
+    def test_middleware_logs_or_raises(self):
+        """Test the middleware logs repeats, or raises when told to"""
+        def view(request):
+            for workout in Workout.objects.all():
+                workout.owner.username
+            return 'response'
+
+        middleware = NPlusOneMiddleware(view)
+        request = RequestFactory().get('/workouts/')
+        with self.assertLogs('diagnostics.nplusone', 'WARNING') as logs:
+            self.assertEqual(middleware(request), 'response')
+        self.assertIn('4x SELECT', logs.output[0])
+        self.assertIn('in view', logs.output[0])
+        with override_settings(NPLUSONE_RAISE=True):
+            with self.assertRaises(NPlusOneError):
+                middleware(request)
+
+    @override_settings(NPLUSONE_THRESHOLD=0)
+    def test_disabled_without_threshold(self):
+        """Test the middleware drops out of the stack when disabled"""
+        with self.assertRaises(MiddlewareNotUsed):
+            NPlusOneMiddleware(lambda request: None)
+
+
+@override_settings(
+    SLOW_REQUEST_THRESHOLD_MS=0.001, SLOW_REQUEST_QUERIES=2,
+    SLOW_REQUEST_CAPTURES=3, RUN_TASKS_ASYNC=False,
+)
+class SlowRequestTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='admin', password='pass'
+        )
+        Workout.objects.create(
+            owner=self.user, title='Run', workout_type='cardio',
+            duration=30, date_logged='2024-01-01',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_slow_request_is_captured_with_plans(self):
+        """Test a slow request is stored with its slowest explained SQL"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/workouts/', {'workout_type': 'cardio'})
+        self.assertEqual(response.status_code, 200)
+        capture = SlowRequest.objects.get()
+        self.assertEqual(capture.view_name, 'workout-list')
+        self.assertEqual(capture.query_params, {'workout_type': ['cardio']})
+        self.assertEqual(capture.status_code, 200)
+        self.assertGreaterEqual(capture.query_count, len(capture.queries))
+        self.assertEqual(len(capture.queries), 2)
+        durations = [query['duration_ms'] for query in capture.queries]
+        self.assertEqual(durations, sorted(durations, reverse=True))
+        self.assertTrue(all(query['plan'] for query in capture.queries))
+        self.assertTrue(all(query['params'] == [] for query in capture.queries))
+
+    @override_settings(SLOW_REQUEST_PARAMS=True)
+    def test_captured_parameters(self):
+        """Test SELECT parameters are kept on request and tokens redacted"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/workouts/', {'api_token': 'abc', 'page_size': 5})
+        capture = SlowRequest.objects.get()
+        self.assertEqual(capture.query_params['page_size'], ['5'])
+        self.assertNotIn('abc', capture.query_params['api_token'][0])
+        self.assertIn(repr(self.user.pk), capture.queries[0]['params'])
+
+        capture.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/workouts/', {
+                'title': 'Secret swim', 'workout_type': 'sports',
+                'duration': 20, 'date_logged': '2024-01-02',
+            })
+        queries = SlowRequest.objects.get().queries
+        self.assertNotIn('Secret swim', json.dumps(queries))
+
+    def test_captures_are_a_ring_buffer(self):
+        """Test only the newest captures are kept"""
+        for _ in range(5):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get('/workouts/')
+        self.assertEqual(SlowRequest.objects.count(), 3)
+
+    def test_admin_shows_plans(self):
+        """Test a capture's statements and plans render in the admin"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/workouts/')
+        capture = SlowRequest.objects.get()
+        self.client.force_login(self.user)
+        response = self.client.get(
+            f'/admin/diagnostics/slowrequest/{capture.pk}/change/'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, capture.queries[0]['plan'][:20])
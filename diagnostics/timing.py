@@ -0,0 +1,92 @@
+"""
+Per-request timing of the phases of a request.
+
+The request being timed is held in a context variable, so code outside the
+middleware records into it without a reference to the request, and does
+nothing but look the variable up when the request was not sampled.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from rest_framework import serializers
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self._active = set()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def milliseconds(self, name):
+        return round(self.durations.get(name, 0.0) * 1000, 3)
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - start)
+
+
+def current_timings():
+    """The timings of the request being handled, or None if not sampled."""
+    return _current.get()
+
+
+@contextmanager
+def timing_request():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to ``name`` on the current request.
+    Nested blocks of the same name are counted once.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._active:
+        yield
+        return
+    timings._active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(name)
+        timings.add(name, time.perf_counter() - start)
+
+
+def _timed_property(prop, name):
+    def fget(self):
+        with timed(name):
+            return prop.fget(self)
+    fget.timed = True
+    return property(fget, prop.fset, prop.fdel, prop.__doc__)
+
+
+def instrument_serializers():
+    """
+    Time ``.data`` on every DRF serializer as ``serialize``. ``.data`` is
+    where a serializer walks its instances, and the property is shared by
+    all of them, so it is wrapped rather than asking each serializer in
+    the project to opt in.
+    """
+    for cls in (
+        serializers.BaseSerializer, serializers.Serializer,
+        serializers.ListSerializer,
+    ):
+        prop = cls.__dict__['data']
+        if not getattr(prop.fget, 'timed', False):
+            cls.data = _timed_property(prop, 'serialize')
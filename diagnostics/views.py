@@ -0,0 +1,22 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from .metrics import registry
+
+
+@require_GET
+def metrics_route(request):
+    """
+    The metrics registry in the Prometheus text format, for scraping.
+    Requires ``Authorization: Bearer <METRICS_TOKEN>`` when a token is set,
+    as it always is outside development.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
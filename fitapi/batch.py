@@ -0,0 +1,119 @@
+"""
+Dispatch of batched sub-requests through the URLconf.
+
+Each sub-request is rebuilt as a ``WSGIRequest`` that carries the outer
+request's headers and is force-authenticated as its user, so the
+middleware stack and authentication run once for the whole batch.
+"""
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+from rest_framework import permissions
+
+logger = logging.getLogger(__name__)
+
+# Validators sent with the batch describe the batch, not its parts
+DROPPED_HEADERS = (
+    'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH',
+    'HTTP_IF_UNMODIFIED_SINCE',
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.BATCH_MAX_WORKERS, thread_name_prefix='fitapi-batch'
+)
+
+
+def build_sub_request(request, method, path, body=None):
+    url = urlsplit(path)
+    payload = b'' if body is None else json.dumps(body).encode()
+    environ = {
+        key: value for key, value in request.META.items()
+        if key not in DROPPED_HEADERS
+    }
+    environ.update({
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': io.BytesIO(payload),
+    })
+    sub_request = WSGIRequest(environ)
+    sub_request.user = request.user
+    sub_request._force_auth_user = request.user
+    if hasattr(request, 'session'):
+        sub_request.session = request.session
+    return sub_request
+
+
+def _body(response):
+    if hasattr(response, 'data'):
+        return response.data
+    if response.streaming:
+        response.close()
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content or 'null')
+    return response.content.decode(response.charset)
+
+
+def dispatch(request, method, path, body=None):
+    """
+    Run one sub-request and return its ``status``, ``headers`` and
+    ``body`` (the response data, before rendering, for API views).
+    """
+    sub_request = build_sub_request(request, method, path, body)
+    try:
+        match = resolve(sub_request.path_info)
+        if match.url_name == 'batch':
+            return {
+                'status': 400, 'headers': {},
+                'body': {'detail': 'Batches cannot be nested.'},
+            }
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Resolver404 as exc:
+        response = response_for_exception(sub_request, exc)
+    except Exception as exc:
+        logger.exception("Batched %s %s failed", method, path)
+        response = response_for_exception(sub_request, exc)
+    return {
+        'status': response.status_code,
+        'headers': dict(response.items()),
+        'body': _body(response),
+    }
+
+
+def _dispatch_in_thread(request, method, path, body):
+    try:
+        return dispatch(request, method, path, body)
+    finally:
+        close_old_connections()
+
+
+def run_batch(request, sub_requests, concurrent=False):
+    """
+    Dispatch ``sub_requests`` (``method``/``path``/``body`` dicts) in
+    order. With ``concurrent``, a batch made up only of reads runs on a
+    thread pool instead; batches containing writes always run in order.
+    """
+    calls = [
+        (sub['method'], sub['path'], sub.get('body'))
+        for sub in sub_requests
+    ]
+    if concurrent and all(
+        method in permissions.SAFE_METHODS for method, _, _ in calls
+    ):
+        futures = [
+            _executor.submit(_dispatch_in_thread, request, *call)
+            for call in calls
+        ]
+        return [future.result() for future in futures]
+    return [dispatch(request, *call) for call in calls]
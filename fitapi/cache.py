@@ -0,0 +1,166 @@
+import hashlib
+import uuid
+from django.core.cache import cache
+from django.db import connection, transaction
+from rest_framework.response import Response
+
+TAG_PREFIX = 'cache-tag:'
+STATS_PREFIX = 'cache-stats:'
+STATS_NAMES = ('hits', 'misses', 'invalidations')
+
+
+def _tag_key(tag):
+    return f'{TAG_PREFIX}{tag}'
+
+
+def _count(name, amount=1):
+    key = f'{STATS_PREFIX}{name}'
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def tag_versions(tags):
+    """
+    The current version token of each tag. A tag without one (never used,
+    or invalidated since) is given a fresh token.
+    """
+    keys = {tag: _tag_key(tag) for tag in tags}
+    stored = cache.get_many(list(keys.values()))
+    versions = {}
+    for tag, key in keys.items():
+        if key not in stored:
+            token = uuid.uuid4().hex
+            if not cache.add(key, token, timeout=None):
+                token = cache.get(key, token)
+            stored[key] = token
+        versions[tag] = stored[key]
+    return versions
+
+
+def invalidate_tags(*tags):
+    """
+    Retire every cache entry built while depending on any of ``tags``.
+
+    Entries are keyed by the versions of their tags, so dropping a tag's
+    version orphans them without having to find them; they age out of the
+    backend on their own timeout. Inside a transaction the tags are
+    dropped again on commit, as a concurrent reader may have re-cached the
+    state from before the write in between.
+    """
+    if tags:
+        keys = [_tag_key(tag) for tag in tags]
+        cache.delete_many(keys)
+        _count('invalidations', len(tags))
+        if connection.in_atomic_block:
+            transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def cache_key(name, tags):
+    """The key ``name`` is stored under for the current versions of ``tags``."""
+    versions = tag_versions(tags)
+    fingerprint = '|'.join(f'{tag}={versions[tag]}' for tag in sorted(tags))
+    return 'cache-entry:' + hashlib.md5(
+        f'{name}|{fingerprint}'.encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def get_or_set(name, tags, builder, timeout=300):
+    """
+    Return the value cached under ``name`` for the current versions of
+    ``tags``, calling ``builder`` to produce and store it on a miss. A
+    ``None`` from ``builder`` is returned but not stored.
+    """
+    return get_or_set_versioned(name, tags, builder, timeout)[0]
+
+
+def get_or_set_versioned(name, tags, builder, timeout=300,
+                         dependencies=None):
+    """
+    ``get_or_set`` returning ``(value, version)``, where ``version``
+    changes whenever the value may have (``None`` if it was not stored).
+
+    ``dependencies(value)`` names further tags read off the built value,
+    such as the rows a page shows, which cannot be known before building
+    it. Their versions are stored with the value and checked on each hit,
+    so one row changing only retires the entries showing it.
+    """
+    key = cache_key(name, tags)
+    entry = cache.get(key)
+    if entry is not None:
+        value, versions = entry
+        if not versions or tag_versions(versions) == versions:
+            _count('hits')
+            return value, _version(key, versions)
+    _count('misses')
+    value = builder()
+    if value is None:
+        return None, None
+    versions = tag_versions(set(dependencies(value))) if dependencies else {}
+    cache.set(key, (value, versions), timeout=timeout)
+    return value, _version(key, versions)
+
+
+def _version(key, versions):
+    return hashlib.md5(
+        repr((key, sorted(versions.items()))).encode(), usedforsecurity=False
+    ).hexdigest()
+
+
+def cache_statistics():
+    """Hit, miss and invalidation counts across all processes."""
+    keys = [f'{STATS_PREFIX}{name}' for name in STATS_NAMES]
+    stored = cache.get_many(keys)
+    stats = {
+        name: stored.get(key, 0) for name, key in zip(STATS_NAMES, keys)
+    }
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+    return stats
+
+
+class CachedResponseMixin:
+    """
+    Caches the data of successful GET responses, keyed by view, full path
+    and requesting user, and tagged with whatever ``get_cache_tags``
+    returns so that model signals can invalidate it. Tags only known from
+    the data, such as those of the rows a page shows, come from
+    ``get_cache_dependencies``.
+
+    ``cache_version`` identifies the data served, for use as a validator.
+    """
+    cache_timeout = 300
+    cache_version = None
+
+    def get_cache_tags(self):
+        raise NotImplementedError
+
+    def get_cache_dependencies(self, data):
+        return []
+
+    def get_cache_name(self):
+        return '|'.join([
+            type(self).__qualname__,
+            self.request.get_full_path(),
+            str(self.request.user.pk),
+        ])
+
+    def get(self, request, *args, **kwargs):
+        rendered = []
+
+        def build():
+            response = super(CachedResponseMixin, self).get(
+                request, *args, **kwargs
+            )
+            rendered.append(response)
+            return response.data if response.status_code == 200 else None
+
+        data, self.cache_version = get_or_set_versioned(
+            self.get_cache_name(), list(self.get_cache_tags()), build,
+            self.cache_timeout, self.get_cache_dependencies
+        )
+        if rendered:
+            return rendered[0]
+        return Response(data)
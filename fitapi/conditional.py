@@ -0,0 +1,102 @@
+import hashlib
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework import mixins
+from fitapi.cache import CachedResponseMixin
+from fitapi.serializers import ViewerRelationMixin
+
+
+class ConditionalGetMixin:
+    """
+    Answers ``If-None-Match``/``If-Modified-Since`` on GET without
+    serializing the response.
+
+    The validator is built from a narrow ``values()`` read of the rows the
+    response would contain (the current page for lists): their pks, the
+    ``validator_fields`` that capture everything else the representation
+    shows, such as ``updated_at`` and counters, the viewer's relations to
+    them and the requesting user. ``Last-Modified`` is only sent by detail
+    views naming ``last_modified_fields`` that every change to the
+    representation bumps; counters do not touch ``updated_at``, so views
+    showing them rely on the ETag alone. Lists never send it: deleting a
+    row, or an older row moving into the page, does not advance the
+    newest timestamp on the page.
+
+    Views that also use ``CachedResponseMixin`` already track changes
+    through their cache tags, so their ETag is the version of the cached
+    data and costs no queries on a cache hit.
+    """
+    validator_fields = ('updated_at',)
+    last_modified_fields = ()
+
+    def get_validator_lookup(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+
+    def get_validator_rows(self):
+        fields = {'pk', *self.validator_fields, *self.last_modified_fields}
+        ordering = getattr(self.paginator, 'ordering', ())
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        fields.update(field.lstrip('-') for field in ordering)
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *sorted(fields)
+        )
+        if isinstance(self, mixins.ListModelMixin):
+            page = self.paginate_queryset(queryset)
+            return list(queryset if page is None else page)
+        return list(queryset.filter(**self.get_validator_lookup()))
+
+    def get_validators(self):
+        """The ``(etag, last_modified)`` of the response to this request."""
+        rows = self.get_validator_rows()
+        relations = {}
+        serializer = self.get_serializer()
+        if isinstance(serializer, ViewerRelationMixin):
+            relations = serializer.load_viewer_relations(
+                [row['pk'] for row in rows]
+            )
+        fingerprint = repr((
+            self.request.user.pk,
+            self.request.accepted_renderer.format,
+            [sorted(row.items()) for row in rows],
+            sorted((name, sorted(ids.items())) for name, ids in relations.items()),
+        ))
+        etag = hashlib.md5(
+            fingerprint.encode(), usedforsecurity=False
+        ).hexdigest()
+        stamps = [] if isinstance(self, mixins.ListModelMixin) else [
+            row[field] for row in rows for field in self.last_modified_fields
+            if row[field] is not None
+        ]
+        last_modified = int(max(stamps).timestamp()) if stamps else None
+        return etag, last_modified
+
+    def get(self, request, *args, **kwargs):
+        if isinstance(self, CachedResponseMixin):
+            return self.get_cached(request, *args, **kwargs)
+        etag, last_modified = self.get_validators()
+        response = get_conditional_response(
+            request, etag=quote_etag(etag), last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_cached(self, request, *args, **kwargs):
+        # The version of the cached data is the validator, so the data is
+        # looked up (without queries on a hit) before answering
+        response = super().get(request, *args, **kwargs)
+        if response.status_code != 200 or self.cache_version is None:
+            return response
+        etag = quote_etag(hashlib.md5(
+            repr((self.cache_version, request.accepted_renderer.format))
+            .encode(), usedforsecurity=False
+        ).hexdigest())
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag, response=response)
@@ -0,0 +1,11 @@
+from django.db.models import F
+
+
+def adjust_counter(queryset, field, delta):
+    """
+    Atomically add ``delta`` to a denormalized counter column on every row
+    in ``queryset``. Decrements never take a counter below zero.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
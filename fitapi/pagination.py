@@ -0,0 +1,26 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the newest-first ordering, with the primary key
+    as a tiebreaker. Each page is a bounded range scan on a matching index,
+    however deep it is, and no COUNT(*) is ever run.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-pk')
+
+
+class DateLoggedCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-date_logged', '-pk')
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Ranked results have no stable seek key, so search is paged by number.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,244 @@
+import copy
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import FileField
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PKOnlyObject, RelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from diagnostics.timing import timed
+from fitapi.serializers import ViewerRelationMixin
+
+_projections = {}
+
+
+class RowProjection:
+    """
+    A serializer compiled into one ``values()`` projection and a converter
+    per field, for rendering read-only lists without model instances or
+    DRF's per-field attribute lookups.
+
+    Plain and pk-only related fields keep their own ``to_representation``
+    so the output matches the serializer exactly. A source that does not
+    exist on the model is left out, as DRF skips it at render time, unless
+    a relation on the way to it is missing, which DRF renders as null. A
+    ``SerializerMethodField`` must either be a viewer relation or have a
+    ``row_<name>(row)`` method on the serializer that reads the projected
+    values named in ``method_field_sources``. A field with
+    ``source_columns`` is rendered by its ``from_columns()``, given the
+    value of each.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        method_sources = getattr(serializer_class, 'method_field_sources', {})
+        relations = getattr(serializer_class, 'viewer_relations', {})
+        self.columns = {'pk'}
+        self.fields = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name in relations:
+                    self.fields.append((name, 'relation', None))
+                elif hasattr(serializer_class, f'row_{name}'):
+                    source = method_sources.get(name)
+                    if source:
+                        self.columns.add(source.replace('.', '__'))
+                    self.fields.append((name, 'method', f'row_{name}'))
+                else:
+                    raise ImproperlyConfigured(
+                        f"{serializer_class.__name__}.{name} needs a "
+                        f"row_{name}() method to be projected."
+                    )
+                continue
+            if hasattr(field, 'source_columns'):
+                attrs = [] if field.source == '*' else field.source_attrs
+                lookups = []
+                for column in field.source_columns:
+                    resolved = self._resolve(model, attrs + [column], name)
+                    if resolved is None or resolved[1] is None:
+                        raise ImproperlyConfigured(
+                            f"{serializer_class.__name__}.{name} reads "
+                            f"{column}, which is not a column."
+                        )
+                    lookups.append(resolved[0])
+                self.columns.update(lookups)
+                self.fields.append((name, 'columns', (lookups, field)))
+                continue
+            if (
+                field.source == '*'
+                or isinstance(field, (serializers.BaseSerializer, ManyRelatedField))
+                or (isinstance(field, RelatedField)
+                    and not field.use_pk_only_optimization())
+            ):
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name} cannot be projected."
+                )
+            resolved = self._resolve(model, field.source_attrs, name)
+            if resolved is None:
+                continue
+            lookup, converter = resolved
+            self.columns.add(lookup)
+            if converter is None:
+                self.fields.append((name, 'absent', lookup))
+            else:
+                self.fields.append((name, 'value', (lookup, converter, field)))
+
+    def _resolve(self, model, attrs, name):
+        """
+        The ``values()`` lookup of ``attrs`` and the converter for its
+        values. An attribute the model lacks resolves to nothing, or past a
+        relation to that relation's key with no converter.
+        """
+        path = []
+        for index, attr in enumerate(attrs):
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if hasattr(model, attr):
+                    raise ImproperlyConfigured(
+                        f"{self.serializer_class.__name__}.{name} reads "
+                        f"{attr}, which is not a column."
+                    )
+                return ('__'.join(path), None) if path else None
+            if model_field.many_to_many or model_field.one_to_many:
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name} spans a "
+                    f"to-many relation."
+                )
+            path.append(attr)
+            rest = attrs[index + 1:]
+            if model_field.is_relation and rest:
+                model = model_field.related_model
+                continue
+            if isinstance(model_field, FileField) and rest in ([], ['url']):
+                return '__'.join(path), _file_converter(model_field, rest)
+            if rest:
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{name} reads "
+                    f"{'.'.join(rest)} of a column."
+                )
+            if model_field.is_relation:
+                return '__'.join(path), _pk_converter
+            return '__'.join(path), _value_converter
+        return None
+
+    def values(self, queryset, extra_columns=()):
+        return queryset.prefetch_related(None).values(
+            *sorted(self.columns.union(extra_columns))
+        )
+
+    def serialize(self, rows, context):
+        """Render ``values()`` rows as the serializer would, in order."""
+        rows = list(rows)
+        serializer = self.serializer_class(context=context)
+        relations = {}
+        if isinstance(serializer, ViewerRelationMixin):
+            relations = serializer.load_viewer_relations(
+                [row['pk'] for row in rows]
+            )
+        fields = []
+        for name, kind, arg in self.fields:
+            if kind == 'value':
+                lookup, converter, field = arg
+                arg = (lookup, converter(_pin_settings(field)))
+            elif kind == 'method':
+                arg = getattr(serializer, arg)
+            fields.append((name, kind, arg))
+        data = []
+        for row in rows:
+            item = {}
+            for name, kind, arg in fields:
+                if kind == 'value':
+                    lookup, convert = arg
+                    value = row[lookup]
+                    item[name] = None if value is None else convert(value)
+                elif kind == 'method':
+                    item[name] = arg(row)
+                elif kind == 'absent':
+                    if row[arg] is None:
+                        item[name] = None
+                elif kind == 'columns':
+                    lookups, field = arg
+                    item[name] = field.from_columns(
+                        *(row[lookup] for lookup in lookups)
+                    )
+                else:
+                    item[name] = relations[name].get(row['pk'])
+            data.append(item)
+        return data
+
+
+def _pin_settings(field):
+    """
+    A copy of a date or datetime field with its output format and (active)
+    time zone fixed, so they are looked up once per page rather than once
+    per value.
+    """
+    if isinstance(field, serializers.DateTimeField):
+        field = copy.copy(field)
+        field.format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        if not hasattr(field, 'timezone'):
+            field.timezone = field.default_timezone()
+    elif isinstance(field, serializers.DateField):
+        field = copy.copy(field)
+        field.format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    return field
+
+
+def _value_converter(field):
+    return field.to_representation
+
+
+def _pk_converter(field):
+    return lambda value: field.to_representation(PKOnlyObject(pk=value))
+
+
+def _file_converter(model_field, rest):
+    def file_converter(field):
+        # Rows often share a file (e.g. an owner's avatar); resolve each
+        # name once per page.
+        urls = {}
+
+        def convert(name):
+            if name not in urls:
+                value = model_field.attr_class(None, model_field, name)
+                urls[name] = field.to_representation(value.url if rest else value)
+            return urls[name]
+        return convert
+    return file_converter
+
+
+def get_row_projection(serializer_class):
+    """The (cached) ``RowProjection`` of ``serializer_class``."""
+    if serializer_class not in _projections:
+        _projections[serializer_class] = RowProjection(serializer_class)
+    return _projections[serializer_class]
+
+
+class ProjectedListMixin:
+    """
+    List view mixin that renders pages through the serializer's
+    ``RowProjection`` instead of instantiating and serializing models.
+    Writes and detail views are unaffected.
+    """
+
+    def list(self, request, *args, **kwargs):
+        projection = get_row_projection(self.get_serializer_class())
+        ordering = getattr(self.paginator, 'ordering', ())
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        rows = projection.values(
+            self.filter_queryset(self.get_queryset()),
+            extra_columns={field.lstrip('-') for field in ordering},
+        )
+        page = self.paginate_queryset(rows)
+        with timed('serialize'):
+            data = projection.serialize(
+                rows if page is None else page, self.get_serializer_context()
+            )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
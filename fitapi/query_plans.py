@@ -0,0 +1,146 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import permissions, serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+_plans = {}
+
+
+class QueryPlan:
+    """
+    The ``select_related``/``prefetch_related``/``only()`` arguments a
+    serializer needs to render a queryset without lazy loads.
+
+    ``only`` is ``None`` when the serializer may touch columns the planner
+    cannot see, in which case no columns are deferred.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.select_related = set()
+        self.prefetch_related = set()
+        self.only = set()
+
+    def apply(self, queryset, restrict_columns=True, extra_columns=()):
+        if self.select_related:
+            queryset = queryset.select_related(*sorted(self.select_related))
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*sorted(self.prefetch_related))
+        if restrict_columns and self.only is not None:
+            queryset = queryset.only(*sorted(self.only.union(extra_columns)))
+        return queryset
+
+    def add_source(self, attrs, whole_object=False, pk_only=False):
+        """
+        Record what rendering ``attrs`` (a field's ``source_attrs``) reads.
+        """
+        model = self.model
+        path = []
+        for index, attr in enumerate(attrs):
+            try:
+                field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Properties and methods may read any column of the row;
+                # anything else (e.g. a missing attribute) reads nothing.
+                if hasattr(model, attr):
+                    self._add_whole_object(path, model)
+                return
+            if not field.is_relation:
+                self._add_column(path + [attr])
+                return
+            if field.many_to_many or field.one_to_many:
+                self.prefetch_related.add('__'.join(path + [attr]))
+                self.only = None
+                return
+            if pk_only and index == len(attrs) - 1:
+                self._add_column(path + [attr])
+                return
+            path.append(attr)
+            self.select_related.add('__'.join(path))
+            if field.concrete:
+                self._add_column(path)
+            model = field.related_model
+        if whole_object:
+            self._add_whole_object(path, model)
+
+    def _add_column(self, path):
+        if self.only is not None:
+            self.only.add('__'.join(path))
+
+    def _add_whole_object(self, path, model):
+        if not path:
+            self.only = None
+            return
+        for field in model._meta.concrete_fields:
+            self._add_column(path + [field.name])
+
+
+def get_query_plan(serializer_class):
+    """
+    Build (once per serializer class) the query plan for rendering its
+    ``Meta.model``.
+
+    Dotted ``source=`` paths become ``select_related``/``prefetch_related``
+    calls and the columns they end on feed ``only()``. A
+    ``SerializerMethodField`` is opaque, so the serializer lists the source
+    each one reads in ``method_field_sources`` (``''`` for none); an
+    undeclared method field disables column restriction. Fields rendered
+    from several columns of their source name them in ``source_columns``.
+    """
+    if serializer_class in _plans:
+        return _plans[serializer_class]
+
+    serializer = serializer_class()
+    plan = QueryPlan(serializer.Meta.model)
+    method_sources = getattr(serializer_class, 'method_field_sources', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in method_sources:
+                plan.only = None
+            elif method_sources[name]:
+                plan.add_source(method_sources[name].split('.'))
+        elif hasattr(field, 'source_columns'):
+            attrs = [] if field.source == '*' else field.source_attrs
+            for column in field.source_columns:
+                plan.add_source(attrs + [column])
+        elif field.source == '*':
+            plan.only = None
+        elif isinstance(field, ManyRelatedField):
+            plan.add_source(field.source_attrs)
+        elif isinstance(field, RelatedField):
+            plan.add_source(
+                field.source_attrs,
+                whole_object=not field.use_pk_only_optimization(),
+                pk_only=field.use_pk_only_optimization(),
+            )
+        elif isinstance(field, serializers.BaseSerializer):
+            plan.add_source(field.source_attrs, whole_object=True)
+        else:
+            plan.add_source(field.source_attrs)
+
+    _plans[serializer_class] = plan
+    return plan
+
+
+class QueryPlanMixin:
+    """
+    Generic view mixin that shapes the queryset to what the serializer
+    renders, so list endpoints run a constant number of queries.
+
+    Columns are only deferred on safe methods; writes load full rows. The
+    paginator's ordering columns are always loaded, since cursor positions
+    are read from them.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        plan = get_query_plan(self.get_serializer_class())
+        ordering = getattr(self.paginator, 'ordering', ())
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return plan.apply(
+            queryset,
+            restrict_columns=self.request.method in permissions.SAFE_METHODS,
+            extra_columns={field.lstrip('-') for field in ordering},
+        )
@@ -0,0 +1,123 @@
+"""
+Full-text search over model text fields.
+
+On PostgreSQL each searchable model keeps a weighted ``search_vector``
+(``tsvector``) column, indexed with GIN and refreshed on save. On SQLite
+(the ``DEV`` database) the text is mirrored into an FTS5 table named
+``<db_table>_fts`` whose rowid is the model's primary key. Both rank with
+higher-is-better scores, exposed as a ``rank`` annotation.
+"""
+import re
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import ValidationError
+
+SEARCH_CONFIG = 'english'
+# Relative weights of PostgreSQL's A-D labels, reused for FTS5's bm25()
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+
+def fts_match(text):
+    """
+    An FTS5 query matching rows that contain every word of ``text``, with
+    any FTS5 syntax in it treated as plain words.
+    """
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def get_search_text(request):
+    """The ``q`` query parameter, which search endpoints require."""
+    text = request.query_params.get('q', '').strip()
+    if not text:
+        raise ValidationError({'q': ['This query parameter is required.']})
+    return text
+
+
+class SearchIndex:
+    """
+    The search index of ``model`` over ``fields``, a ``{field: weight}``
+    mapping of text fields to ``'A'``-``'D'`` weights.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.fts_table = f'{model._meta.db_table}_fts'
+
+    def vector(self):
+        vectors = [
+            SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+            for field, weight in self.fields.items()
+        ]
+        combined = vectors[0]
+        for vector in vectors[1:]:
+            combined = combined + vector
+        return combined
+
+    def refresh(self, pks):
+        """Re-index the rows with primary keys ``pks``."""
+        pks = list(pks)
+        if not pks:
+            return
+        if connection.vendor == 'postgresql':
+            self.model.objects.filter(pk__in=pks).update(
+                search_vector=self.vector()
+            )
+        elif connection.vendor == 'sqlite':
+            rows = self.model.objects.filter(pk__in=pks).values_list(
+                'pk', *self.fields
+            )
+            columns = ', '.join(self.fields)
+            placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+            with connection.cursor() as cursor:
+                self._delete(cursor, pks)
+                cursor.executemany(
+                    f'INSERT INTO {self.fts_table} (rowid, {columns}) '
+                    f'VALUES ({placeholders})',
+                    list(rows)
+                )
+
+    def remove(self, pks):
+        """Drop the rows with primary keys ``pks`` from the index."""
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                self._delete(cursor, list(pks))
+
+    def _delete(self, cursor, pks):
+        cursor.execute(
+            f'DELETE FROM {self.fts_table} WHERE rowid IN '
+            f'({", ".join(["%s"] * len(pks))})',
+            pks
+        )
+
+    def search(self, queryset, text):
+        """
+        ``queryset`` narrowed to rows matching ``text``, best match first,
+        with the score in ``rank``.
+        """
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(text, config=SEARCH_CONFIG)
+            queryset = queryset.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            )
+        else:
+            match = fts_match(text)
+            if not match:
+                return queryset.none()
+            table = self.fts_table
+            weights = ', '.join(
+                str(WEIGHTS[weight]) for weight in self.fields.values()
+            )
+            pk_column = (
+                f'{self.model._meta.db_table}.{self.model._meta.pk.column}'
+            )
+            queryset = queryset.filter(pk__in=RawSQL(
+                f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match]
+            )).annotate(rank=RawSQL(
+                f'SELECT -bm25({table}, {weights}) FROM {table} '
+                f'WHERE {table} MATCH %s AND rowid = {pk_column}', [match]
+            ))
+        return queryset.order_by('-rank', '-pk')
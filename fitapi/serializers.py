@@ -1,12 +1,99 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import models
 from dj_rest_auth.serializers import UserDetailsSerializer
 from rest_framework import serializers
+from profiles.images import ProfileImageField
 
 
 class CurrentUserSerializer(UserDetailsSerializer):
     profile_id = serializers.ReadOnlyField(source='profile.id')
-    profile_image = serializers.ReadOnlyField(source='profile.image.url')
+    profile_image = ProfileImageField(source='profile', size='avatar')
 
     class Meta(UserDetailsSerializer.Meta):
         fields = UserDetailsSerializer.Meta.fields + (
             'profile_id', 'profile_image'
-        )
\ No newline at end of file
+        )
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(
+        choices=['GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'],
+        default='GET'
+    )
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if not value.startswith('/'):
+            raise serializers.ValidationError(
+                "Use an absolute path such as /workouts/."
+            )
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(
+        many=True, allow_empty=False, max_length=settings.BATCH_MAX_REQUESTS
+    )
+    concurrent = serializers.BooleanField(default=False)
+
+
+class ViewerRelationListSerializer(serializers.ListSerializer):
+    """
+    List serializer that loads the child's viewer relations for the whole
+    page up front, so each row reads them from a dict.
+    """
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        instances = list(data)
+        self.child.prefetch_viewer_relations(instances)
+        return [self.child.to_representation(item) for item in instances]
+
+
+class ViewerRelationMixin:
+    """
+    Resolves relationships between the requesting user and the serialized
+    objects, such as the viewer's like of a post.
+
+    ``viewer_relations`` maps a name to a ``(model, object_field,
+    viewer_field)`` triple: the related row is found by filtering ``model``
+    on ``object_field`` (the serialized object) and ``viewer_field`` (the
+    request user), and its ``id`` is returned. Pair with
+    ``list_serializer_class = ViewerRelationListSerializer`` so that lists
+    resolve each relation with one ``IN`` query.
+    """
+    viewer_relations = {}
+
+    def prefetch_viewer_relations(self, instances):
+        self._viewer_relations = self.load_viewer_relations(
+            [instance.pk for instance in instances]
+        )
+
+    def load_viewer_relations(self, keys):
+        """Each relation as a ``{object pk: related id}`` dict."""
+        return {
+            name: self._load_viewer_relation(name, keys)
+            for name in self.viewer_relations
+        }
+
+    def get_viewer_relation(self, name, obj):
+        prefetched = getattr(self, '_viewer_relations', {})
+        if name in prefetched:
+            return prefetched[name].get(obj.pk)
+        return self._load_viewer_relation(name, [obj.pk]).get(obj.pk)
+
+    def _load_viewer_relation(self, name, keys):
+        request = self.context.get('request')
+        if not (request and request.user.is_authenticated and keys):
+            return {}
+        model, object_field, viewer_field = self.viewer_relations[name]
+        if isinstance(model, str):
+            model = apps.get_model(model)
+        return dict(
+            model.objects.filter(**{
+                viewer_field: request.user,
+                f'{object_field}__in': keys,
+            }).values_list(object_field, 'id')
+        )
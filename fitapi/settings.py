@@ -2,6 +2,7 @@ from pathlib import Path
 import os
 import dj_database_url
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 
 # Load environment variables from env.py if it exists
 if os.path.exists('env.py'):
@@ -26,6 +27,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'fitapi.pagination.CreatedAtCursorPagination',
 }
 
 # JWT settings
@@ -143,11 +145,16 @@ INSTALLED_APPS = [
     'likes',
     'workoutposts',
     'followers',
+    'diagnostics',
 ]
 SITE_ID = 1
 
 # Middleware configuration
 MIDDLEWARE = [
+    'diagnostics.middleware.MetricsMiddleware',
+    'diagnostics.middleware.NPlusOneMiddleware',
+    'diagnostics.middleware.SlowRequestMiddleware',
+    'diagnostics.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -194,6 +201,92 @@ else:
         'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
     }
 
+# Cache settings: Redis, shared by every worker. Cached responses are
+# invalidated through tag versions kept in the cache, so a per-process
+# cache would leave the other workers serving stale responses; only
+# development (a single runserver process) may fall back to memory.
+if 'REDIS_URL' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+elif 'DEV' in os.environ:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    raise ImproperlyConfigured(
+        "REDIS_URL must be set outside development: the response cache is "
+        "shared between gunicorn workers."
+    )
+
+# Background tasks run on a thread pool after commit; turn off to run inline
+RUN_TASKS_ASYNC = os.environ.get('RUN_TASKS_ASYNC', 'True') == 'True'
+
+# Batch endpoint: sub-requests per batch and threads for concurrent reads
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# Home feed: timelines keep the newest HOME_FEED_TIMELINE_CAP posts; authors
+# with more than HOME_FEED_FANOUT_LIMIT followers are merged in at read time
+HOME_FEED_TIMELINE_CAP = 500
+HOME_FEED_FANOUT_LIMIT = 1000
+HOME_FEED_BACKFILL = 50
+
+# Fraction of requests given a Server-Timing header and timing log line;
+# 0 (the default in development) removes the middleware altogether
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get(
+    'SERVER_TIMING_SAMPLE_RATE', '0' if 'DEV' in os.environ else '0.05'
+))
+
+# Metrics: shard files shared by the gunicorn workers (set and emptied by
+# gunicorn.conf.py; unset keeps metrics per process) and the bearer token
+# /metrics/ requires, which only development may go without
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+if not METRICS_TOKEN and 'DEV' not in os.environ:
+    raise ImproperlyConfigured(
+        "METRICS_TOKEN must be set outside development: /metrics/ would "
+        "otherwise be public."
+    )
+
+# N+1 detection: statements run more than NPLUSONE_THRESHOLD times in one
+# request are logged, or raised with NPLUSONE_RAISE; off outside development
+NPLUSONE_THRESHOLD = int(os.environ.get(
+    'NPLUSONE_THRESHOLD', '5' if 'DEV' in os.environ else '0'
+))
+NPLUSONE_RAISE = os.environ.get('NPLUSONE_RAISE') == 'True'
+
+# Slow requests: those over SLOW_REQUEST_THRESHOLD_MS (0, the default in
+# development, disables capture) are stored with their slowest statements'
+# plans; only the newest SLOW_REQUEST_CAPTURES are kept. The statements'
+# parameters are only stored (for SELECTs) with SLOW_REQUEST_PARAMS on
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get(
+    'SLOW_REQUEST_THRESHOLD_MS', '0' if 'DEV' in os.environ else '1000'
+))
+SLOW_REQUEST_QUERIES = 5
+SLOW_REQUEST_CAPTURES = 200
+SLOW_REQUEST_PARAMS = os.environ.get('SLOW_REQUEST_PARAMS') == 'True'
+
+# Diagnostics log lines go to stderr alongside the server's own logging
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'diagnostics': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 # Password validation settings
 AUTH_PASSWORD_VALIDATORS = [
     {
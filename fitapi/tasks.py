@@ -0,0 +1,32 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='fitapi-task')
+
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background task %s failed", func.__qualname__)
+    finally:
+        connections.close_all()
+
+
+def run_after_commit(func, *args):
+    """
+    Run ``func(*args)`` once the current transaction commits, on a small
+    background thread pool unless ``RUN_TASKS_ASYNC`` is off (then inline).
+    Tasks must be safe to lose if the process exits first.
+    """
+    def dispatch():
+        if settings.RUN_TASKS_ASYNC:
+            _executor.submit(_run, func, args)
+        else:
+            func(*args)
+
+    transaction.on_commit(dispatch)
@@ -0,0 +1,338 @@
+import json
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework import status
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
+from comments.models import Comment
+from fitapi.projections import ProjectedListMixin, get_row_projection
+from followers.models import Follower
+from likes.models import Like
+from profiles.models import Profile
+from workoutposts.models import TimelineEntry, WorkoutPost, post_search
+from workouts.models import Workout, workout_search
+from workouts.stats import rebuild_workout_stats
+
+
+class BatchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def batch(self, *requests, **options):
+        return self.client.post(
+            reverse('batch'), {'requests': list(requests), **options},
+            format='json'
+        )
+
+    def test_sub_requests_run_in_order_as_the_user(self):
+        """Test a batch writes then reads through the normal views"""
+        response = self.batch(
+            {'method': 'POST', 'path': '/workouts/', 'body': {
+                'title': 'Run', 'workout_type': 'cardio', 'duration': 30,
+                'date_logged': '2024-05-01',
+            }},
+            {'path': '/workouts/?page_size=5'},
+            {'path': '/profiles/current/'},
+            {'path': '/missing/'},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        created, listed, profile, missing = response.data['responses']
+        self.assertEqual(created['status'], 201)
+        self.assertEqual(listed['body']['results'][0]['id'], created['body']['id'])
+        self.assertTrue(profile['body']['is_owner'])
+        self.assertIn('ETag', profile['headers'])
+        self.assertEqual(missing['status'], 404)
+
+    def test_batches_are_validated(self):
+        """Test nested, relative and oversized batches are refused"""
+        nested = self.batch({'method': 'POST', 'path': '/batch/', 'body': {}})
+        self.assertEqual(nested.data['responses'][0]['status'], 400)
+        self.assertEqual(
+            self.batch({'path': 'workouts/'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        too_many = [{'path': '/'}] * 21
+        self.assertEqual(
+            self.batch(*too_many).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(
+            self.batch({'path': '/'}).status_code,
+            status.HTTP_403_FORBIDDEN
+        )
+
+
+class ConcurrentBatchTests(TransactionTestCase):
+    def test_reads_run_concurrently(self):
+        """Test a batch of reads gives the same responses on the pool"""
+        user = User.objects.create_user(
+            username='testuser', password='testpass123')
+        Workout.objects.create(
+            owner=user, title='Run', workout_type='cardio', duration=30)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        requests = [
+            {'path': '/workouts/'},
+            {'path': '/workouts/statistics/'},
+            {'path': '/profiles/current/'},
+        ]
+        results = [
+            client.post(reverse('batch'), {
+                'requests': requests, 'concurrent': concurrent,
+            }, format='json').data['responses']
+            for concurrent in (False, True)
+        ]
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[1][1]['body']['total_workouts'], 1)
+
+
+# Third-party URLconfs, which are not ours to budget
+UNBUDGETED_PREFIXES = ('admin/', 'api-auth/', 'dj-rest-auth/')
+
+# route: (method, path, request body, max queries, max serialized rows)
+QUERY_BUDGETS = {
+    '': ('GET', '/', None, 0, 1),
+    'logout/': ('POST', '/logout/', None, 0, 0),
+    'cache-stats/': ('GET', '/cache-stats/', None, 0, 1),
+    'batch/': ('POST', '/batch/', {'requests': [
+        {'path': '/profiles/current/'}, {'path': '/workouts/statistics/'},
+    ]}, 5, 20),
+    'metrics/': ('GET', '/metrics/', None, 0, 0),
+    'profiles/': ('GET', '/profiles/', None, 2, 21),
+    'profiles/current/': ('GET', '/profiles/current/', None, 4, 1),
+    'profiles/<int:owner>/': ('GET', '/profiles/{owner}/', None, 2, 1),
+    'profiles/<int:owner>/statistics/': (
+        'GET', '/profiles/{owner}/statistics/', None, 2, 14),
+    'workouts/': ('GET', '/workouts/', None, 2, 21),
+    'workouts/<int:pk>/': ('GET', '/workouts/{workout}/', None, 1, 1),
+    'workouts/search/': ('GET', '/workouts/search/?q=workout', None, 2, 21),
+    # Exports stream a user's whole history, one row per workout
+    'workouts/export/': (
+        'GET', '/workouts/export/?output=ndjson', None, 1, 30),
+    'workouts/import/': ('POST', '/workouts/import/', (
+        'title,workout_type,duration,date_logged\n'
+        'A,cardio,10,2024-01-01\nB,sports,20,2024-02-01\n'
+    ), 16, 1),
+    'workouts/statistics/': ('GET', '/workouts/statistics/', None, 1, 15),
+    'posts/': ('GET', '/posts/', None, 2, 21),
+    'posts/search/': ('GET', '/posts/search/?q=post', None, 3, 21),
+    'posts/feed/': ('GET', '/posts/feed/', None, 3, 21),
+    'likes/likes/': ('GET', '/likes/likes/', None, 1, 21),
+    'comments/comments/': ('GET', '/comments/comments/', None, 1, 21),
+    'followers/followers/': ('GET', '/followers/followers/', None, 1, 21),
+    'followers/followers/<int:pk>/': (
+        'DELETE', '/followers/followers/{follow}/', None, 7, 0),
+}
+
+
+def project_routes(resolver=None, prefix=''):
+    """Every route in the project URLconf, as its pattern string."""
+    resolver = resolver or get_resolver()
+    routes = []
+    for pattern in resolver.url_patterns:
+        route = prefix + str(pattern.pattern)
+        if route.startswith(UNBUDGETED_PREFIXES):
+            continue
+        if isinstance(pattern, URLResolver):
+            routes.extend(project_routes(pattern, route))
+        elif isinstance(pattern, URLPattern):
+            routes.append(route)
+    return routes
+
+
+def serialized_rows(data):
+    """The number of JSON objects in a response body."""
+    if isinstance(data, dict):
+        return 1 + sum(serialized_rows(value) for value in data.values())
+    if isinstance(data, list):
+        return sum(serialized_rows(value) for value in data)
+    return 0
+
+
+@override_settings(NPLUSONE_THRESHOLD=3, NPLUSONE_RAISE=True)
+class QueryBudgetTests(APITestCase):
+    """
+    Every endpoint against a densely connected dataset, failing when one
+    runs more queries or renders more rows than its budget allows, or
+    repeats a statement per row. Lists are paginated, so their budgets
+    must not grow with the data.
+    """
+    USERS = 12
+    WORKOUTS_PER_USER = 30
+    POSTS_PER_USER = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([
+            User(username=f'athlete{i}') for i in range(cls.USERS)
+        ])
+        Profile.objects.bulk_create([Profile(owner=user) for user in users])
+        cls.viewer = users[0]
+        Follower.objects.bulk_create([
+            Follower(follower=follower, followed=followed)
+            for follower in users for followed in users
+            if follower != followed
+        ])
+        workouts = Workout.objects.bulk_create([
+            Workout(
+                owner=user, title=f'Workout {n}', workout_type='cardio',
+                duration=30, date_logged=f'2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}'
+            )
+            for user in users for n in range(cls.WORKOUTS_PER_USER)
+        ])
+        posts = WorkoutPost.objects.bulk_create([
+            WorkoutPost(owner=workout.owner, workout=workout, content='A post')
+            for workout in workouts
+            if int(workout.title.split()[1]) < cls.POSTS_PER_USER
+        ])
+        Like.objects.bulk_create([
+            Like(owner=user, post=post) for user in users for post in posts
+        ])
+        Comment.objects.bulk_create([
+            Comment(user=user, post=post, content='Nice')
+            for user in users[:4] for post in posts
+        ])
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(owner=cls.viewer, post=post, created_at=post.created_at)
+            for post in posts if post.owner != cls.viewer
+        ])
+        rebuild_workout_stats([user.pk for user in users])
+        workout_search.refresh(workout.pk for workout in workouts)
+        post_search.refresh(post.pk for post in posts)
+        cls.other = users[1]
+        cls.ids = {
+            'owner': cls.other.pk,
+            'workout': Workout.objects.filter(owner=cls.viewer).first().pk,
+            'follow': Follower.objects.get(
+                follower=cls.viewer, followed=cls.other).pk,
+        }
+        cls.viewer.is_staff = True
+        cls.viewer.save()
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.viewer)
+
+    def test_every_route_has_a_budget(self):
+        self.assertCountEqual(project_routes(), QUERY_BUDGETS)
+
+    def test_endpoints_stay_within_budget(self):
+        for route, budget in QUERY_BUDGETS.items():
+            method, path, body, max_queries, max_rows = budget
+            with self.subTest(route=route):
+                # Budgets are for a cold cache, the worst case
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.request(method, path.format(**self.ids), body)
+                    rows = serialized_rows(self.body_of(response))
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(
+                    len(queries), max_queries,
+                    '\n'.join(q['sql'] for q in queries.captured_queries)
+                )
+                self.assertLessEqual(rows, max_rows)
+
+    def request(self, method, path, body):
+        if isinstance(body, str):
+            return self.client.generic(method, path, body, 'text/csv')
+        return self.client.generic(
+            method, path, json.dumps(body) if body else '', 'application/json'
+        )
+
+    def body_of(self, response):
+        if response.streaming:
+            return [
+                json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()
+            ]
+        # Plain Django views (such as the metrics text) render no rows
+        return getattr(response, 'data', None)
+
+
+def projected_views(resolver=None):
+    """Every view in the project URLconf that renders rows by projection."""
+    resolver = resolver or get_resolver()
+    views = set()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            views |= projected_views(pattern)
+        elif issubclass(
+            getattr(pattern.callback, 'view_class', object),
+            ProjectedListMixin
+        ):
+            views.add(pattern.callback.view_class)
+    return views
+
+
+@override_settings(RUN_TASKS_ASYNC=False)
+class RowProjectionTests(APITestCase):
+    """
+    Each projected list renders exactly as its serializer would, for the
+    owner, another user and an anonymous viewer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner, cls.other, cls.ghost = [
+            User.objects.create_user(username=name, password='testpass123')
+            for name in ('owner', 'other', 'ghost')
+        ]
+        # A missing profile leaves the profile columns null
+        Profile.objects.filter(owner=cls.ghost).delete()
+        # Variants make the image columns differ from the original
+        Profile.objects.filter(owner=cls.other).update(
+            image='images/other.jpg', image_variants={
+                'source': 'images/other.jpg',
+                'avatar': 'images/other_avatar.webp',
+            },
+        )
+        for user in (cls.owner, cls.other, cls.ghost):
+            workout = Workout.objects.create(
+                owner=user, title='Run', workout_type='cardio', duration=30,
+                notes='Running' if user == cls.owner else '',
+            )
+            post = WorkoutPost.objects.create(
+                owner=user, workout=workout, content='Run by the lake')
+            TimelineEntry.objects.bulk_create([
+                TimelineEntry(owner=reader, post=post, created_at=post.created_at)
+                for reader in (cls.owner, cls.other)
+            ])
+            Comment.objects.create(user=user, post=post, content='Nice')
+        Like.objects.create(owner=cls.owner, post=post)
+
+    def test_projections_match_serializers(self):
+        views = sorted(projected_views(), key=lambda view: view.__name__)
+        self.assertTrue(views)
+        for view_class in views:
+            for user in (self.owner, self.other, AnonymousUser()):
+                with self.subTest(view=view_class.__name__, user=str(user)):
+                    self.assert_projection_matches(view_class, user)
+
+    def assert_projection_matches(self, view_class, user):
+        view = view_class()
+        request = view.initialize_request(
+            APIRequestFactory().get('/', {'q': 'run'})
+        )
+        request.user = user
+        view.request, view.args, view.kwargs = request, (), {}
+        view.format_kwarg = None
+        try:
+            view.check_permissions(request)
+        except (NotAuthenticated, PermissionDenied):
+            return
+        queryset = view.filter_queryset(view.get_queryset()).order_by('pk')
+        self.assertTrue(queryset.exists())
+        context = view.get_serializer_context()
+        projection = get_row_projection(view.get_serializer_class())
+        self.assertEqual(
+            JSONRenderer().render(projection.serialize(
+                projection.values(queryset), context)),
+            JSONRenderer().render(view.get_serializer_class()(
+                queryset, many=True, context=context).data)
+        )
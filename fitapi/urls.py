@@ -1,12 +1,18 @@
 from django.contrib import admin
 from django.urls import path, include
-from .views import root_route, logout_route
+from diagnostics.views import metrics_route
+from .views import (
+    root_route, logout_route, cache_stats_route, batch_route,
+)
 
 urlpatterns = [
     path('', root_route, name='root'),
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
     path('logout/', logout_route),
+    path('cache-stats/', cache_stats_route, name='cache-stats'),
+    path('batch/', batch_route, name='batch'),
+    path('metrics/', metrics_route, name='metrics'),
     path('profiles/', include('profiles.urls')),
     path('workouts/', include('workouts.urls')),
     path('posts/', include('workoutposts.urls')),
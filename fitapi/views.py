@@ -1,5 +1,9 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from .batch import run_batch
+from .cache import cache_statistics
+from .serializers import BatchSerializer
 from .settings import (
     JWT_AUTH_COOKIE, JWT_AUTH_REFRESH_COOKIE, JWT_AUTH_SAMESITE,
     JWT_AUTH_SECURE,
@@ -37,3 +41,30 @@ def logout_route(request):
         secure=JWT_AUTH_SECURE,
     )
     return response
+
+
+@api_view()
+@permission_classes([IsAdminUser])
+def cache_stats_route(request):
+    """Response cache hit, miss and invalidation counters, for sizing."""
+    return Response(cache_statistics())
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_route(request):
+    """
+    Run several API requests in one round trip, as the requesting user.
+
+    Takes ``{"requests": [{"method", "path", "body"}, ...]}`` and returns
+    each response's ``status``, ``headers`` and ``body`` in order. Pass
+    ``"concurrent": true`` to run a batch of reads in parallel.
+    """
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    responses = run_batch(
+        request._request,
+        serializer.validated_data['requests'],
+        concurrent=serializer.validated_data['concurrent'],
+    )
+    return Response({'responses': responses})
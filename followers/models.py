@@ -1,5 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from fitapi.cache import invalidate_tags
+from fitapi.counters import adjust_counter
+from profiles.models import Profile
 
 
 class Follower(models.Model):
@@ -13,6 +18,43 @@ class Follower(models.Model):
 
     class Meta:
         unique_together = ('follower', 'followed')
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], name='follower_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.follower.username} follows {self.followed.username}"
+
+
+def _adjust_follow_counters(follower, delta):
+    with transaction.atomic():
+        adjust_counter(
+            Profile.objects.filter(pk=follower.followed_id),
+            'followers_count', delta
+        )
+        adjust_counter(
+            Profile.objects.filter(pk=follower.follower_id),
+            'following_count', delta
+        )
+
+
+@receiver(post_save, sender=Follower)
+def increment_follow_counters(sender, instance, created, **kwargs):
+    if created:
+        _adjust_follow_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Follower)
+def decrement_follow_counters(sender, instance, **kwargs):
+    _adjust_follow_counters(instance, -1)
+
+
+@receiver([post_save, post_delete], sender=Follower)
+def invalidate_follow_caches(sender, instance, **kwargs):
+    invalidate_tags(
+        f'profile:{instance.follower_id}',
+        f'profile:{instance.followed_id}',
+        f'follow:{instance.follower_id}:{instance.followed_id}',
+    )
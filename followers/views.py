@@ -1,10 +1,11 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
+from fitapi.query_plans import QueryPlanMixin
 from .models import Follower
 from .serializers import FollowerSerializer
 
 
-class FollowerListView(generics.ListCreateAPIView):
+class FollowerListView(QueryPlanMixin, generics.ListCreateAPIView):
     serializer_class = FollowerSerializer
     permission_classes = [IsAuthenticated]
     queryset = Follower.objects.all()
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings. The workers record metrics into shard files in
+METRICS_MULTIPROC_DIR so that a scrape of any worker covers them all.
+"""
+import os
+import shutil
+import tempfile
+
+metrics_dir = os.environ.setdefault(
+    'METRICS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'fitapi-metrics'),
+)
+
+
+def on_starting(server):
+    # Files left by a previous server would be summed into this one's
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    from diagnostics.metrics import fold_process
+    fold_process(metrics_dir, worker.pid)
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('likes', '0002_rename_user_like_owner_alter_like_unique_together'),
+        ('workoutposts', '0004_cursor_pagination_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['-created_at', '-id'], name='like_created_idx'),
+        ),
+    ]
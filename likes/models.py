@@ -1,5 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from fitapi.cache import invalidate_tags
+from fitapi.counters import adjust_counter
 from workoutposts.models import WorkoutPost
 
 
@@ -18,6 +22,29 @@ class Like(models.Model):
 
     class Meta:
         unique_together = ['owner', 'post']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='like_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.owner} likes {self.post}"
+
+
+@receiver(post_save, sender=Like)
+def increment_likes_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(
+            WorkoutPost.objects.filter(pk=instance.post_id), 'likes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Like)
+def decrement_likes_count(sender, instance, **kwargs):
+    adjust_counter(
+        WorkoutPost.objects.filter(pk=instance.post_id), 'likes_count', -1
+    )
+
+
+@receiver([post_save, post_delete], sender=Like)
+def invalidate_post_caches(sender, instance, **kwargs):
+    invalidate_tags(f'post:{instance.post_id}')
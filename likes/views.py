@@ -1,10 +1,11 @@
 from rest_framework import generics, permissions
 from fitapi.permissions import IsOwnerOrReadOnly
+from fitapi.query_plans import QueryPlanMixin
 from .models import Like
 from .serializers import LikeSerializer
 
 
-class LikeList(generics.ListCreateAPIView):
+class LikeList(QueryPlanMixin, generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     serializer_class = LikeSerializer
     queryset = Like.objects.all()
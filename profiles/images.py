@@ -0,0 +1,147 @@
+"""
+Fixed-size variants of profile images, rendered with Pillow and stored
+beside the original through the image field's storage.
+
+``Profile.image_variants`` maps each variant to its stored name, plus the
+``source`` image they were made from; variants of any other image are
+stale and the original is served instead.
+"""
+import io
+import logging
+import os
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from fitapi.cache import invalidate_tags
+from fitapi.tasks import run_after_commit
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+# name: (width, height, crop to fill rather than fit within)
+VARIANTS = {
+    'avatar': (96, 96, True),
+    'thumbnail': (320, 320, True),
+    'full': (1200, 1200, False),
+}
+VARIANT_FORMAT = ('WEBP', '.webp')
+VARIANT_QUALITY = 80
+
+
+def image_storage():
+    return Profile._meta.get_field('image').storage
+
+
+def variant_name(image, variants, size):
+    """The stored name serving ``size`` of ``image``."""
+    if variants and variants.get('source') == image:
+        return variants.get(size, image)
+    return image
+
+
+def render_variants(file):
+    """The encoded bytes of each variant of an image file."""
+    with Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert(
+            'RGBA' if image.has_transparency_data else 'RGB'
+        )
+    rendered = {}
+    for name, (width, height, crop) in VARIANTS.items():
+        if crop:
+            variant = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        else:
+            variant = image.copy()
+            variant.thumbnail((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        variant.save(buffer, VARIANT_FORMAT[0], quality=VARIANT_QUALITY)
+        rendered[name] = buffer.getvalue()
+    return rendered
+
+
+def generate_image_variants(profile_pk):
+    """
+    Render and store the variants of a profile's current image, replacing
+    those of its previous one.
+    """
+    profile = Profile.objects.filter(pk=profile_pk).only('image').first()
+    if profile is None or not profile.image:
+        return
+    source = profile.image.name
+    storage = image_storage()
+    try:
+        with storage.open(source) as file:
+            rendered = render_variants(file)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning("Could not render variants of %s", source, exc_info=True)
+        return
+
+    root = os.path.splitext(source)[0]
+    variants = {'source': source}
+    for name, content in rendered.items():
+        variants[name] = storage.save(
+            f'{root}_{name}{VARIANT_FORMAT[1]}', ContentFile(content)
+        )
+    # The variants being replaced are read under the row lock, so that of
+    # overlapping jobs each one deletes the files of the job it replaced.
+    # updated_at moves so conditional GETs see the new URLs; the image may
+    # have been replaced meanwhile, leaving these variants unused
+    with transaction.atomic():
+        current = Profile.objects.select_for_update().filter(
+            pk=profile_pk, image=source
+        ).only('image_variants').first()
+        if current is not None:
+            Profile.objects.filter(pk=profile_pk).update(
+                image_variants=variants, updated_at=timezone.now()
+            )
+    if current is not None:
+        invalidate_tags(f'profile:{profile_pk}')
+        unused = _stored(current.image_variants or {}) - _stored(variants)
+    else:
+        unused = _stored(variants)
+    for stored in unused:
+        storage.delete(stored)
+
+
+def _stored(variants):
+    """The variant files named in ``variants``, without their source."""
+    return {
+        stored for name, stored in variants.items() if name != 'source'
+    }
+
+
+@receiver(post_save, sender=Profile)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    # The shared default image is served as it is
+    image = instance.image.name
+    if raw or not image or image == sender._meta.get_field('image').default:
+        return
+    if (instance.image_variants or {}).get('source') != image:
+        run_after_commit(generate_image_variants, instance.pk)
+
+
+class ProfileImageField(serializers.Field):
+    """
+    The URL of one size of a profile image, read from the profile at
+    ``source``. Falls back to the original until variants exist.
+    """
+    source_columns = ('image', 'image_variants')
+
+    def __init__(self, size, **kwargs):
+        if size not in VARIANTS:
+            raise ValueError(f"Unknown image size {size!r}.")
+        self.size = size
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, profile):
+        return self.from_columns(profile.image.name, profile.image_variants)
+
+    def from_columns(self, image, image_variants):
+        """The URL for the values of ``source_columns``."""
+        name = variant_name(image, image_variants, self.size)
+        return image_storage().url(name) if name else None
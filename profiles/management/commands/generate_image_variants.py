@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from profiles.images import generate_image_variants
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the avatar, thumbnail and full variants of every uploaded "
+        "profile image that does not have current ones yet, such as images "
+        "uploaded before variants existed."
+    )
+
+    def handle(self, *args, **options):
+        default = Profile._meta.get_field('image').default
+        profiles = (
+            Profile.objects.exclude(image__in=['', default])
+            .only('pk', 'image', 'image_variants').order_by('pk')
+        )
+        generated = 0
+        for profile in profiles.iterator():
+            if profile.image_variants.get('source') != profile.image.name:
+                generate_image_variants(profile.pk)
+                generated += 1
+        self.stdout.write(f"Variants generated for {generated} profile(s).")
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from fitapi.cache import invalidate_tags
+from followers.models import Follower
+from profiles.models import Profile
+from workoutposts.models import WorkoutPost
+
+
+def count_of(model, field):
+    """Correlated subquery counting ``model`` rows pointing at the owner."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('owner')})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the posts, followers and following counters on every "
+        "Profile (or those of the given users) in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Number of profiles recounted per UPDATE statement.",
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only recount this user's profile (may be repeated).",
+        )
+
+    def handle(self, *args, chunk_size, user_ids, **options):
+        profiles = Profile.objects.order_by('pk')
+        if user_ids:
+            profiles = profiles.filter(pk__in=user_ids)
+
+        updated = 0
+        last_pk = 0
+        while True:
+            chunk = list(
+                profiles.filter(pk__gt=last_pk)
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+
+            with transaction.atomic():
+                counts = {
+                    'posts_count': count_of(WorkoutPost, 'owner'),
+                    'followers_count': count_of(Follower, 'followed'),
+                    'following_count': count_of(Follower, 'follower'),
+                }
+                # Only the cached responses of drifted profiles are stale
+                drifted = list(
+                    Profile.objects.filter(pk__in=chunk)
+                    .annotate(
+                        actual_posts=counts['posts_count'],
+                        actual_followers=counts['followers_count'],
+                        actual_following=counts['following_count'],
+                    )
+                    .filter(
+                        ~Q(posts_count=F('actual_posts')) |
+                        ~Q(followers_count=F('actual_followers')) |
+                        ~Q(following_count=F('actual_following'))
+                    )
+                    .values_list('pk', flat=True)
+                )
+                updated += Profile.objects.filter(pk__in=chunk).update(
+                    **counts
+                )
+                invalidate_tags(*(f'profile:{pk}' for pk in drifted))
+
+        self.stdout.write(f"{updated} profile(s) recounted.")
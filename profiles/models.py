@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from fitapi.cache import invalidate_tags
 
 class Profile(models.Model):
     owner = models.OneToOneField(
@@ -17,9 +18,19 @@ class Profile(models.Model):
         upload_to='images/', 
         default='images/default_profile_ylwpgw.png'
     )
+    # Stored names of the resized copies of image; see profiles.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-owner'], name='profile_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.owner}'s profile"
@@ -27,4 +38,17 @@ class Profile(models.Model):
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.create(owner=instance)
\ No newline at end of file
+        Profile.objects.create(owner=instance)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_caches(sender, instance, **kwargs):
+    invalidate_tags(f'profile:{instance.owner_id}')
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_caches(sender, instance, created, update_fields, **kwargs):
+    # Logins only touch last_login, which no cached response renders.
+    if created or update_fields == frozenset(['last_login']):
+        return
+    invalidate_tags(f'profile:{instance.pk}')
@@ -1,13 +1,19 @@
 from rest_framework import serializers
+from fitapi.serializers import ViewerRelationListSerializer, ViewerRelationMixin
+from .images import ProfileImageField
 from .models import Profile
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(ViewerRelationMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     is_owner = serializers.SerializerMethodField()
     following_id = serializers.SerializerMethodField()
-    posts_count = serializers.ReadOnlyField()
-    followers_count = serializers.ReadOnlyField()
-    following_count = serializers.ReadOnlyField()
+    image_thumbnail = ProfileImageField(source='*', size='thumbnail')
+
+    method_field_sources = {'is_owner': 'owner', 'following_id': ''}
+    # Profiles are keyed by their owner, so the pk is the followed user id.
+    viewer_relations = {
+        'following_id': ('followers.Follower', 'followed', 'follower'),
+    }
 
     def get_is_owner(self, obj):
         """
@@ -20,19 +26,14 @@ class ProfileSerializer(serializers.ModelSerializer):
         """
         Returns the ID of the follow relationship if the current user is following the profile's owner.
         """
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            following = request.user.following.filter(
-                followed=obj.owner
-            ).first()
-            return following.id if following else None
-        return None
+        return self.get_viewer_relation('following_id', obj)
 
     class Meta:
         model = Profile
+        list_serializer_class = ViewerRelationListSerializer
         fields = [
             'owner', 'created_at', 'updated_at', 'name',
-            'content', 'image', 'is_owner', 'following_id',
+            'content', 'image', 'image_thumbnail', 'is_owner', 'following_id',
             'posts_count', 'followers_count', 'following_count',
         ]
         read_only_fields = ['created_at', 'updated_at', 'posts_count', 'followers_count', 'following_count']
@@ -1,9 +1,26 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from . import images
+from .images import generate_image_variants, variant_name
 from .models import Profile
 from followers.models import Follower
+from workoutposts.models import WorkoutPost
+from workouts.models import Workout
 
 class ProfileTests(APITestCase):
     def setUp(self):
@@ -60,6 +77,30 @@ class ProfileTests(APITestCase):
         self.assertIn('total_workouts', response.data)
         self.assertIn('total_duration', response.data)
 
+    def test_profile_statistics_cached_until_workout_write(self):
+        """Test profile statistics are cached per user version"""
+        cache.clear()
+        url = reverse('profile-statistics', kwargs={'owner': self.user2.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            Workout.objects.create(
+                owner=self.user2, title='Lift', workout_type='strength', duration=40
+            )
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_duration'], 40)
+        self.assertEqual(response.data['workout_types'][0]['workout_type'], 'strength')
+        self.assertEqual(len(response.data['monthly_trends']), 1)
+
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Workout.objects.create(
+                owner=self.user2, title='Run', workout_type='cardio', duration=20
+            )
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_workouts'], 2)
+        self.assertEqual(response.data['total_duration'], 60)
+
     def test_following_id_present(self):
         """Test following_id field in profile response"""
         follower = Follower.objects.create(follower=self.user, followed=self.user2)
@@ -67,4 +108,210 @@ class ProfileTests(APITestCase):
             reverse('profile-detail', kwargs={'owner': self.user2.id})
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data['following_id'], follower.id)
\ No newline at end of file
+        self.assertEqual(response.data['following_id'], follower.id)
+
+    def test_profile_counters_maintained(self):
+        """Test counters follow post and follower writes"""
+        workout = Workout.objects.create(
+            owner=self.user, title='Run', workout_type='cardio', duration=30
+        )
+        post = WorkoutPost.objects.create(owner=self.user, workout=workout)
+        follow = Follower.objects.create(follower=self.user, followed=self.user2)
+
+        profile = Profile.objects.get(owner=self.user)
+        self.assertEqual(profile.posts_count, 1)
+        self.assertEqual(profile.following_count, 1)
+        self.assertEqual(Profile.objects.get(owner=self.user2).followers_count, 1)
+
+        post.delete()
+        follow.delete()
+        profile.refresh_from_db()
+        self.assertEqual(profile.posts_count, 0)
+        self.assertEqual(profile.following_count, 0)
+        self.assertEqual(Profile.objects.get(owner=self.user2).followers_count, 0)
+
+    def test_recount_profile_counters(self):
+        """Test the recount command repairs drifted counters"""
+        Follower.objects.create(follower=self.user2, followed=self.user)
+        Profile.objects.filter(owner=self.user).update(
+            followers_count=5, posts_count=2
+        )
+        url = reverse('profile-detail', kwargs={'owner': self.user.id})
+        self.assertEqual(self.client.get(url).data['followers_count'], 5)
+        call_command('recount_profile_counters', chunk_size=1, stdout=StringIO())
+        profile = Profile.objects.get(owner=self.user)
+        self.assertEqual(profile.followers_count, 1)
+        self.assertEqual(profile.posts_count, 0)
+        self.assertEqual(self.client.get(url).data['followers_count'], 1)
+
+    def test_following_ids_resolved_in_one_query(self):
+        """Test profile list loads following_id for the page in one query"""
+        others = [
+            User.objects.create_user(username=f'other{i}', password='testpass123')
+            for i in range(3)
+        ]
+        follows = {
+            user.id: Follower.objects.create(follower=self.user, followed=user).id
+            for user in others
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('profile-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        following = {
+            profile['owner']: profile['following_id'] for profile in response.data['results']
+        }
+        for user in others:
+            self.assertEqual(following[user.username], follows[user.id])
+        self.assertIsNone(following['testuser2'])
+        follower_queries = [
+            q for q in queries.captured_queries
+            if 'followers_follower' in q['sql']
+        ]
+        self.assertEqual(len(follower_queries), 1)
+
+    def test_profile_detail_cache_tracks_follow_edge(self):
+        """Test cached profile detail is invalidated when following changes"""
+        url = reverse('profile-detail', kwargs={'owner': self.user2.id})
+        self.assertIsNone(self.client.get(url).data['following_id'])
+        follower = Follower.objects.create(follower=self.user, followed=self.user2)
+        response = self.client.get(url)
+        self.assertEqual(response.data['following_id'], follower.id)
+        self.assertEqual(response.data['followers_count'], 1)
+        follower.delete()
+        self.assertIsNone(self.client.get(url).data['following_id'])
+
+    def test_current_profile_conditional_get(self):
+        """Test the current profile ETag changes with its counters"""
+        url = reverse('current-user-profile')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Follower.objects.create(follower=self.user2, followed=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followers_count'], 1)
+        self.assertNotIn('Last-Modified', response)
+
+
+def upload(name, size=(1600, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+class ProfileImageVariantTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(
+            MEDIA_ROOT=self.media_root, RUN_TASKS_ASYNC=False
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(username='pictured')
+        self.client.force_authenticate(user=self.user)
+
+    def upload_image(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('profile-detail', kwargs={'owner': self.user.id}),
+                {'image': upload(name)}, format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return Profile.objects.get(owner=self.user)
+
+    def test_variants_generated_on_upload(self):
+        """Test uploading an image stores resized variants beside it"""
+        profile = self.upload_image('me.png')
+        variants = profile.image_variants
+        self.assertEqual(variants['source'], profile.image.name)
+        expected = {'avatar': (96, 96), 'thumbnail': (320, 320), 'full': (1200, 600)}
+        for size, dimensions in expected.items():
+            name = variants[size]
+            self.assertEqual(
+                os.path.dirname(name), os.path.dirname(profile.image.name)
+            )
+            with default_storage.open(name) as file, Image.open(file) as image:
+                self.assertEqual(image.size, dimensions)
+                self.assertEqual(image.format, 'WEBP')
+
+    def test_serializers_request_sizes(self):
+        """Test feed rows get the avatar and profiles the thumbnail"""
+        profile = self.upload_image('me.png')
+        variants = profile.image_variants
+        workout = Workout.objects.create(
+            owner=self.user, title='Run', workout_type='cardio',
+            duration=30, date_logged='2024-01-01',
+        )
+        avatar = default_storage.url(variants['avatar'])
+        listed = self.client.get(reverse('workout-list')).data['results'][0]
+        self.assertEqual(listed['profile_image'], avatar)
+        detail = self.client.get(
+            reverse('workout-detail', kwargs={'pk': workout.pk})
+        ).data
+        self.assertEqual(detail['profile_image'], avatar)
+        current = self.client.get(reverse('current-user-profile')).data
+        self.assertEqual(
+            current['image_thumbnail'],
+            default_storage.url(variants['thumbnail'])
+        )
+
+    def test_replaced_image_drops_old_variants(self):
+        """Test replacing an image deletes the previous variants"""
+        old = self.upload_image('first.png').image_variants
+        new = self.upload_image('second.png').image_variants
+        self.assertNotEqual(old['avatar'], new['avatar'])
+        for size in ('avatar', 'thumbnail', 'full'):
+            self.assertFalse(default_storage.exists(old[size]))
+            self.assertTrue(default_storage.exists(new[size]))
+
+    def test_overlapping_jobs_keep_one_set_of_variants(self):
+        """Test a job finishing during another leaves no variant files behind"""
+        name = default_storage.save('images/twice.png', upload('x.png'))
+        Profile.objects.filter(owner=self.user).update(image=name)
+        profile = Profile.objects.get(owner=self.user)
+        render = images.render_variants
+
+        def render_during_other_job(file):
+            if not overlapped:
+                overlapped.append(True)
+                generate_image_variants(profile.pk)
+            return render(file)
+
+        overlapped = []
+        with mock.patch.object(
+            images, 'render_variants', render_during_other_job
+        ):
+            generate_image_variants(profile.pk)
+        variants = Profile.objects.get(pk=profile.pk).image_variants
+        stored = {
+            f'images/{file}' for file in default_storage.listdir('images')[1]
+        }
+        self.assertEqual(
+            stored, {name, variants['avatar'], variants['thumbnail'], variants['full']}
+        )
+
+    def test_generate_image_variants_command(self):
+        """Test the command backfills images uploaded without variants"""
+        name = default_storage.save('images/legacy.png', upload('x.png'))
+        Profile.objects.filter(owner=self.user).update(image=name)
+        out = StringIO()
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('for 1 profile(s)', out.getvalue())
+        profile = Profile.objects.get(owner=self.user)
+        self.assertEqual(profile.image_variants['source'], name)
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('for 0 profile(s)', out.getvalue())
+
+    def test_stale_variants_fall_back_to_original(self):
+        """Test an image without current variants is served as uploaded"""
+        variants = {'source': 'images/old.png', 'avatar': 'images/old_avatar.webp'}
+        self.assertEqual(
+            variant_name('images/new.png', variants, 'avatar'), 'images/new.png'
+        )
+        self.assertEqual(
+            variant_name('images/old.png', variants, 'avatar'),
+            'images/old_avatar.webp'
+        )
+        self.assertEqual(variant_name('images/new.png', {}, 'full'), 'images/new.png')
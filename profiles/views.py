@@ -2,59 +2,53 @@ from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from django.db.models import Count
 from .models import Profile
 from .serializers import ProfileSerializer
+from fitapi.cache import CachedResponseMixin
+from fitapi.conditional import ConditionalGetMixin
 from fitapi.permissions import IsOwnerOrReadOnly
+from fitapi.query_plans import QueryPlanMixin
+from workouts.stats import user_statistics
 
-class ProfileList(generics.ListAPIView):
+class ProfileList(QueryPlanMixin, generics.ListAPIView):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Profile.objects.annotate(
-            posts_count=Count('owner__workout_posts', distinct=True),
-            followers_count=Count('owner__followers', distinct=True),
-            following_count=Count('owner__following', distinct=True)
-        ).order_by('-created_at')
+        return Profile.objects.order_by('-created_at')
 
-class ProfileDetail(generics.RetrieveUpdateAPIView):
+class ProfileDetail(CachedResponseMixin, QueryPlanMixin,
+                    generics.RetrieveUpdateAPIView):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     permission_classes = [IsOwnerOrReadOnly]
     lookup_field = 'owner'
 
-    def get_queryset(self):
-        return Profile.objects.annotate(
-            posts_count=Count('owner__workout_posts', distinct=True),
-            followers_count=Count('owner__followers', distinct=True),
-            following_count=Count('owner__following', distinct=True)
-        )
+    def get_cache_tags(self):
+        owner = self.kwargs['owner']
+        return [f'profile:{owner}', f'follow:{self.request.user.pk}:{owner}']
 
-class CurrentUserProfile(generics.RetrieveAPIView):
+class CurrentUserProfile(ConditionalGetMixin, QueryPlanMixin,
+                         generics.RetrieveAPIView):
+    queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
+    validator_fields = (
+        'updated_at', 'posts_count', 'followers_count', 'following_count',
+        'owner__username',
+    )
+
+    def get_validator_lookup(self):
+        return {'owner': self.request.user.pk}
 
     def get_object(self):
-        queryset = Profile.objects.annotate(
-            posts_count=Count('owner__workout_posts', distinct=True),
-            followers_count=Count('owner__followers', distinct=True),
-            following_count=Count('owner__following', distinct=True)
-        )
+        queryset = self.filter_queryset(self.get_queryset())
         return get_object_or_404(queryset, owner=self.request.user)
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def profile_statistics(request, owner):
     """Get statistics for a specific profile"""
-    profile = get_object_or_404(Profile, owner=owner)
-    workouts = profile.owner.workouts.all()
-    
-    stats = {
-        'total_workouts': workouts.count(),
-        'total_duration': sum(w.duration for w in workouts),
-        'current_streak': 0
-    }
-    
-    return Response(stats)
+    profile = get_object_or_404(Profile.objects.only('owner'), owner=owner)
+    return Response(user_statistics(profile.owner_id))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WorkoutpostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'workoutposts'
+
+    def ready(self):
+        from . import feed  # noqa: F401  connects the feed signal receivers
@@ -0,0 +1,206 @@
+"""
+Home feed of followed users' posts.
+
+Posts are fanned out on write: once a post commits it is copied into a
+``TimelineEntry`` for each follower of its author, and each timeline is
+trimmed to ``HOME_FEED_TIMELINE_CAP`` entries. Authors with more than
+``HOME_FEED_FANOUT_LIMIT`` followers are skipped on write and their posts
+are merged in when the feed is read instead, until an unfollow takes
+them back to the limit, which backfills their followers' timelines.
+Following someone backfills their recent posts; unfollowing removes them.
+"""
+import functools
+import operator
+from django.conf import settings
+from django.db.models import Count, Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from fitapi.tasks import run_after_commit
+from followers.models import Follower
+from profiles.models import Profile
+from .models import TimelineEntry, WorkoutPost
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def fans_out_on_write(owner_id):
+    return Profile.objects.filter(
+        owner=owner_id,
+        followers_count__lte=settings.HOME_FEED_FANOUT_LIMIT,
+    ).exists()
+
+
+def trim_timelines(owner_ids):
+    """Drop the oldest entries of any timeline over the cap."""
+    cap = settings.HOME_FEED_TIMELINE_CAP
+    overflowing = (
+        TimelineEntry.objects.filter(owner__in=owner_ids)
+        .values('owner')
+        .annotate(entries=Count('id'))
+        .filter(entries__gt=cap)
+        .values_list('owner', flat=True)
+    )
+    for owner_id in overflowing:
+        stale = list(
+            TimelineEntry.objects.filter(owner=owner_id)
+            .order_by('-created_at', '-post')
+            .values_list('pk', flat=True)[cap:]
+        )
+        TimelineEntry.objects.filter(pk__in=stale).delete()
+
+
+def fan_out_post(post_id):
+    post = WorkoutPost.objects.filter(pk=post_id).only(
+        'owner', 'created_at'
+    ).first()
+    if post is None or not fans_out_on_write(post.owner_id):
+        return
+    follower_ids = list(
+        Follower.objects.filter(followed=post.owner_id)
+        .values_list('follower', flat=True)
+    )
+    for start in range(0, len(follower_ids), FANOUT_BATCH_SIZE):
+        batch = follower_ids[start:start + FANOUT_BATCH_SIZE]
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    owner_id=follower_id, post=post,
+                    created_at=post.created_at,
+                )
+                for follower_id in batch
+            ],
+            ignore_conflicts=True,
+        )
+        trim_timelines(batch)
+
+
+def backfill_timeline(follower_id, followed_id):
+    if not fans_out_on_write(followed_id):
+        return
+    if not Follower.objects.filter(
+        follower=follower_id, followed=followed_id
+    ).exists():
+        return
+    recent = (
+        WorkoutPost.objects.filter(owner=followed_id)
+        .order_by('-created_at', '-pk')
+        .values_list('pk', 'created_at')[:settings.HOME_FEED_BACKFILL]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                owner_id=follower_id, post_id=post_id, created_at=created_at,
+            )
+            for post_id, created_at in recent
+        ],
+        ignore_conflicts=True,
+    )
+    trim_timelines([follower_id])
+
+
+def backfill_followers(author_id):
+    """
+    Push an author's recent posts into all their followers' timelines, for
+    an author who fans out on write again; their posts from before were
+    only ever merged in at read time.
+    """
+    if not fans_out_on_write(author_id):
+        return
+    follower_ids = list(
+        Follower.objects.filter(followed=author_id)
+        .values_list('follower', flat=True)
+    )
+    recent = list(
+        WorkoutPost.objects.filter(owner=author_id)
+        .order_by('-created_at', '-pk')
+        .values_list('pk', 'created_at')[:settings.HOME_FEED_BACKFILL]
+    )
+    for start in range(0, len(follower_ids), FANOUT_BATCH_SIZE):
+        batch = follower_ids[start:start + FANOUT_BATCH_SIZE]
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    owner_id=follower_id, post_id=post_id,
+                    created_at=created_at,
+                )
+                for follower_id in batch for post_id, created_at in recent
+            ],
+            batch_size=FANOUT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        trim_timelines(batch)
+
+
+def remove_from_timeline(follower_id, followed_id):
+    if Follower.objects.filter(
+        follower=follower_id, followed=followed_id
+    ).exists():
+        return
+    TimelineEntry.objects.filter(
+        owner=follower_id, post__owner=followed_id
+    ).delete()
+
+
+def home_feed(user, limit, position=None, reverse=False):
+    """
+    The posts a page of ``user``'s feed is cut from: the first ``limit``
+    entries of their timeline past the cursor ``position`` (newest first,
+    or oldest first when paging back), and as many posts of each of the
+    high-follower authors they follow, which were never fanned out.
+
+    Each source is read in the order of its own index and stops at
+    ``limit``, so the posts are only sorted once they are merged, and
+    never more than ``limit`` of them per source.
+    """
+    bound = {}
+    if position is not None:
+        bound = {'created_at__gt' if reverse else 'created_at__lt': position}
+    direction = '' if reverse else '-'
+    sources = [
+        TimelineEntry.objects.filter(owner=user, **bound)
+        .order_by(f'{direction}created_at', f'{direction}post')
+        .values('post')[:limit]
+    ]
+    read_time_authors = Follower.objects.filter(
+        follower=user,
+        followed__profile__followers_count__gt=(
+            settings.HOME_FEED_FANOUT_LIMIT
+        ),
+    ).values_list('followed', flat=True)
+    for author_id in read_time_authors:
+        sources.append(
+            WorkoutPost.objects.filter(owner=author_id, **bound)
+            .order_by(f'{direction}created_at', f'{direction}id')
+            .values('pk')[:limit]
+        )
+    return WorkoutPost.objects.filter(
+        functools.reduce(operator.or_, (Q(pk__in=pks) for pks in sources))
+    )
+
+
+@receiver(post_save, sender=WorkoutPost)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        run_after_commit(fan_out_post, instance.pk)
+
+
+@receiver(post_save, sender=Follower)
+def backfill_on_follow(sender, instance, created, **kwargs):
+    if created:
+        run_after_commit(
+            backfill_timeline, instance.follower_id, instance.followed_id
+        )
+
+
+@receiver(post_delete, sender=Follower)
+def trim_on_unfollow(sender, instance, **kwargs):
+    run_after_commit(
+        remove_from_timeline, instance.follower_id, instance.followed_id
+    )
+    # The counter was decremented in this transaction, under its row lock,
+    # so exactly one unfollow sees the author come back to the limit
+    if Profile.objects.filter(
+        owner=instance.followed_id,
+        followers_count=settings.HOME_FEED_FANOUT_LIMIT,
+    ).exists():
+        run_after_commit(backfill_followers, instance.followed_id)
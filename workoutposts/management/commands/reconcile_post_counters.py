@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from fitapi.cache import invalidate_tags
+from comments.models import Comment
+from likes.models import Like
+from workoutposts.models import WorkoutPost
+
+
+def count_of(model):
+    """Correlated subquery counting ``model`` rows for the outer post."""
+    return Coalesce(Subquery(
+        model.objects.filter(post=OuterRef('pk'))
+        .order_by().values('post')
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute WorkoutPost.likes_count and comments_count from the "
+        "likes and comments tables, repairing any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help="Number of posts checked per transaction.",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report drifted posts without writing.",
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only check this user's posts (may be repeated).",
+        )
+
+    def handle(self, *args, chunk_size, dry_run, user_ids, **options):
+        posts = WorkoutPost.objects.order_by('pk')
+        if user_ids:
+            posts = posts.filter(owner__in=user_ids)
+
+        repaired = 0
+        last_pk = 0
+        while True:
+            chunk = list(
+                posts.filter(pk__gt=last_pk)
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+
+            with transaction.atomic():
+                drifted = list(
+                    WorkoutPost.objects.filter(pk__in=chunk)
+                    .annotate(
+                        actual_likes=count_of(Like),
+                        actual_comments=count_of(Comment),
+                    )
+                    .filter(
+                        ~Q(likes_count=F('actual_likes')) |
+                        ~Q(comments_count=F('actual_comments'))
+                    )
+                    .values_list('pk', flat=True)
+                )
+                if drifted and not dry_run:
+                    WorkoutPost.objects.filter(pk__in=drifted).update(
+                        likes_count=count_of(Like),
+                        comments_count=count_of(Comment),
+                    )
+                    invalidate_tags(*(f'post:{pk}' for pk in drifted))
+            repaired += len(drifted)
+
+        verb = "would be repaired" if dry_run else "repaired"
+        self.stdout.write(f"{repaired} post(s) {verb}.")
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workoutposts', '0003_workoutpost_likes_count_comments_count'),
+        ('workouts', '0003_cursor_pagination_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutpost',
+            index=models.Index(fields=['-created_at', '-id'], name='workoutpost_created_idx'),
+        ),
+    ]
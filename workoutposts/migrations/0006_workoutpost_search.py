@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:09
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE workoutposts_workoutpost SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'A')"
+        )
+        schema_editor.execute(
+            "CREATE INDEX workoutpost_search_idx ON workoutposts_workoutpost "
+            "USING GIN (search_vector)"
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE workoutposts_workoutpost_fts USING "
+            "fts5(content, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO workoutposts_workoutpost_fts (rowid, content) "
+            "SELECT id, content FROM workoutposts_workoutpost"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS workoutpost_search_idx")
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "DROP TABLE IF EXISTS workoutposts_workoutpost_fts"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workoutposts', '0005_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutpost',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
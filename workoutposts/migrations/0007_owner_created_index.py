@@ -0,0 +1,20 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workoutposts', '0006_workoutpost_search'),
+        ('workouts', '0005_workout_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutpost',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='workoutpost_owner_created_idx'),
+        ),
+    ]
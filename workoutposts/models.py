@@ -1,5 +1,12 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from fitapi.cache import invalidate_tags
+from fitapi.counters import adjust_counter
+from fitapi.search import SearchIndex
+from profiles.models import Profile
 from workouts.models import Workout
 
 
@@ -17,9 +24,97 @@ class WorkoutPost(models.Model):
     content = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'], name='workoutpost_created_idx'
+            ),
+            # The posts of each author merged into home feeds at read time
+            models.Index(
+                fields=['owner', '-created_at', '-id'],
+                name='workoutpost_owner_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.owner}'s post: {self.workout.title}"
+
+
+class TimelineEntry(models.Model):
+    """
+    A post pushed into a follower's home feed timeline. ``created_at``
+    copies the post's timestamp so a timeline is read in index order.
+    """
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    post = models.ForeignKey(
+        WorkoutPost,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['owner', 'post']
+        indexes = [
+            models.Index(
+                fields=['owner', '-created_at', '-post'],
+                name='timeline_owner_created_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.post} in {self.owner}'s timeline"
+
+
+post_search = SearchIndex(WorkoutPost, {'content': 'A'})
+
+
+@receiver(post_save, sender=WorkoutPost)
+def increment_posts_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(
+            Profile.objects.filter(pk=instance.owner_id), 'posts_count', 1
+        )
+
+
+@receiver(post_delete, sender=WorkoutPost)
+def decrement_posts_count(sender, instance, **kwargs):
+    adjust_counter(
+        Profile.objects.filter(pk=instance.owner_id), 'posts_count', -1
+    )
+
+
+@receiver([post_save, post_delete], sender=WorkoutPost)
+def invalidate_post_caches(sender, instance, created=True, **kwargs):
+    # Adding or removing a post changes the pages listing posts and its
+    # owner's posts_count; an edit only the entries showing the post
+    if created:
+        invalidate_tags(
+            f'post:{instance.pk}', 'posts', f'profile:{instance.owner_id}'
+        )
+    else:
+        invalidate_tags(f'post:{instance.pk}')
+
+
+@receiver(post_save, sender=WorkoutPost)
+def index_post(sender, instance, raw, update_fields, **kwargs):
+    if raw or (
+        update_fields is not None
+        and not update_fields.intersection(post_search.fields)
+    ):
+        return
+    post_search.refresh([instance.pk])
+
+
+@receiver(post_delete, sender=WorkoutPost)
+def unindex_post(sender, instance, **kwargs):
+    post_search.remove([instance.pk])
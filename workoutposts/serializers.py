@@ -1,36 +1,38 @@
 from rest_framework import serializers
+from fitapi.serializers import ViewerRelationListSerializer, ViewerRelationMixin
+from profiles.images import ProfileImageField
 from .models import WorkoutPost
-from likes.models import Like
 
 
-class WorkoutPostSerializer(serializers.ModelSerializer):
+class WorkoutPostSerializer(ViewerRelationMixin, serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     is_owner = serializers.SerializerMethodField()
     profile_id = serializers.ReadOnlyField(source='owner.profile.id')
-    profile_image = serializers.ReadOnlyField(source='owner.profile.image.url')
+    profile_image = ProfileImageField(source='owner.profile', size='avatar')
     like_id = serializers.SerializerMethodField()
-    likes_count = serializers.ReadOnlyField()
-    comments_count = serializers.ReadOnlyField()
+
+    method_field_sources = {'is_owner': 'owner', 'like_id': ''}
+    viewer_relations = {
+        'like_id': ('likes.Like', 'post', 'owner'),
+    }
 
     def get_is_owner(self, obj):
         request = self.context['request']
         return request.user == obj.owner
 
+    def row_is_owner(self, row):
+        return self.context['request'].user.pk == row['owner']
+
     def get_like_id(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            like = Like.objects.filter(
-                owner=user,
-                post=obj
-            ).first()
-            return like.id if like else None
-        return None
+        return self.get_viewer_relation('like_id', obj)
 
     class Meta:
         model = WorkoutPost
+        list_serializer_class = ViewerRelationListSerializer
         fields = [
             'id', 'owner', 'is_owner', 'profile_id',
             'profile_image', 'created_at', 'updated_at',
             'workout', 'content', 'like_id',
             'likes_count', 'comments_count',
         ]
+        read_only_fields = ['likes_count', 'comments_count']
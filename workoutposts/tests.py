@@ -1,9 +1,18 @@
-from django.test import TestCase
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
 from workouts.models import Workout
-from .models import WorkoutPost
+from likes.models import Like
+from comments.models import Comment
+from followers.models import Follower
+from profiles.models import Profile
+from .models import TimelineEntry, WorkoutPost
 
 
 class WorkoutPostTests(TestCase):
@@ -32,3 +41,247 @@ class WorkoutPostTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertGreater(len(response.data['results']), 0)
         self.assertIn('likes_count', response.data['results'][0])
+
+
+    def test_counters_follow_likes_and_comments(self):
+        like = Like.objects.create(owner=self.user, post=self.post)
+        Comment.objects.create(user=self.user, post=self.post, content='Hi')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 1)
+
+        like.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+    def test_counters_follow_cascade_deletes(self):
+        other = User.objects.create_user(
+            username='otheruser', password='testpass123')
+        Like.objects.create(owner=other, post=self.post)
+        Comment.objects.create(user=other, post=self.post, content='Hi')
+        other.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_reconcile_post_counters(self):
+        Like.objects.create(owner=self.user, post=self.post)
+        WorkoutPost.objects.filter(pk=self.post.pk).update(
+            likes_count=7, comments_count=3)
+        response = self.client.get('/posts/')
+        self.assertEqual(response.data['results'][0]['likes_count'], 7)
+        out = StringIO()
+        call_command('reconcile_post_counters', chunk_size=1, stdout=out)
+        response = self.client.get('/posts/')
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertIn('1 post(s) repaired', out.getvalue())
+
+    def test_like_ids_resolved_in_one_query(self):
+        liked = []
+        for i in range(3):
+            workout = Workout.objects.create(
+                owner=self.user, title=f'Workout {i}',
+                workout_type='cardio', duration=30
+            )
+            post = WorkoutPost.objects.create(owner=self.user, workout=workout)
+            liked.append((post.id, Like.objects.create(
+                owner=self.user, post=post).id))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/posts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        like_ids = {row['id']: row['like_id'] for row in response.data['results']}
+        for post_id, like_id in liked:
+            self.assertEqual(like_ids[post_id], like_id)
+        self.assertIsNone(like_ids[self.post.id])
+        like_queries = [
+            q for q in queries.captured_queries if 'likes_like' in q['sql']
+        ]
+        self.assertEqual(len(like_queries), 1)
+
+    def test_feed_is_cursor_paginated(self):
+        for i in range(3):
+            workout = Workout.objects.create(
+                owner=self.user, title=f'Workout {i}',
+                workout_type='cardio', duration=30
+            )
+            WorkoutPost.objects.create(owner=self.user, workout=workout)
+
+        seen = []
+        url = '/posts/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        expected = list(
+            WorkoutPost.objects.order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_posts_conditional_get_tracks_viewer_likes(self):
+        etag = self.client.get('/posts/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Like.objects.create(owner=self.user, post=self.post)
+        response = self.client.get('/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+
+    def test_search_posts(self):
+        workout = Workout.objects.create(
+            owner=self.user, title='Swim', workout_type='sports', duration=45)
+        swim = WorkoutPost.objects.create(
+            owner=self.user, workout=workout, content='Open water swimming')
+        self.client.force_authenticate(user=None)
+        response = self.client.get('/posts/search/', {'q': 'swim'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row['id'] for row in response.data['results']], [swim.id])
+        self.assertFalse(response.data['results'][0]['is_owner'])
+
+    def test_feed_response_cache_invalidated_by_likes(self):
+        cache.clear()
+        first = self.client.get('/posts/')
+        self.assertEqual(first.data['results'][0]['likes_count'], 0)
+        with self.assertNumQueries(0):
+            self.client.get('/posts/')
+
+        Like.objects.create(owner=self.user, post=self.post)
+        response = self.client.get('/posts/')
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+
+        admin = User.objects.create_superuser(
+            username='admin', password='testpass123')
+        self.client.force_authenticate(user=admin)
+        stats = self.client.get('/cache-stats/').data
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertGreater(stats['invalidations'], 0)
+
+    def test_feed_response_cache_only_invalidated_by_rows_shown(self):
+        other = User.objects.create_user(
+            username='otheruser', password='testpass123')
+        cache.clear()
+        self.client.get('/posts/')
+        self.client.get(f'/workouts/{self.workout.pk}/')
+
+        # The other user's profile is on neither response
+        other.profile.name = 'Renamed'
+        other.profile.save()
+        with self.assertNumQueries(0):
+            self.client.get('/posts/')
+            self.client.get(f'/workouts/{self.workout.pk}/')
+
+        Like.objects.create(owner=other, post=self.post)
+        with self.assertNumQueries(0):
+            self.client.get(f'/workouts/{self.workout.pk}/')
+        response = self.client.get('/posts/')
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
+
+
+@override_settings(RUN_TASKS_ASYNC=False, HOME_FEED_TIMELINE_CAP=2)
+class HomeFeedTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.reader = User.objects.create_user(
+            username='reader', password='testpass123')
+        self.author = User.objects.create_user(
+            username='author', password='testpass123')
+        self.client.force_authenticate(user=self.reader)
+
+    def post_as(self, user, title):
+        workout = Workout.objects.create(
+            owner=user, title=title, workout_type='cardio', duration=30
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            return WorkoutPost.objects.create(owner=user, workout=workout)
+
+    def follow(self, followed):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Follower.objects.create(
+                follower=self.reader, followed=followed)
+
+    def feed_ids(self):
+        response = self.client.get('/posts/feed/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.data['results']]
+
+    def test_new_posts_fan_out_and_timelines_are_capped(self):
+        self.follow(self.author)
+        posts = [self.post_as(self.author, f'Run {i}') for i in range(3)]
+        self.post_as(self.reader, 'Not followed')
+
+        self.assertEqual(
+            TimelineEntry.objects.filter(owner=self.reader).count(), 2)
+        self.assertEqual(self.feed_ids(), [posts[2].id, posts[1].id])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        post = self.post_as(self.author, 'Old run')
+        follow = self.follow(self.author)
+        self.assertEqual(self.feed_ids(), [post.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            follow.delete()
+        self.assertEqual(self.feed_ids(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(HOME_FEED_FANOUT_LIMIT=0)
+    def test_high_follower_authors_are_merged_at_read_time(self):
+        self.follow(self.author)
+        Profile.objects.filter(owner=self.author).update(followers_count=5)
+        post = self.post_as(self.author, 'Popular run')
+
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    @override_settings(HOME_FEED_FANOUT_LIMIT=1)
+    def test_dropping_to_the_fanout_limit_backfills_timelines(self):
+        other = User.objects.create_user(
+            username='other', password='testpass123')
+        self.follow(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            unfollow = Follower.objects.create(
+                follower=other, followed=self.author)
+        post = self.post_as(self.author, 'Popular run')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            unfollow.delete()
+        self.assertEqual(self.feed_ids(), [post.id])
+        self.assertTrue(
+            TimelineEntry.objects.filter(owner=self.reader, post=post).exists())
+
+    @override_settings(HOME_FEED_FANOUT_LIMIT=1, HOME_FEED_TIMELINE_CAP=10)
+    def test_feed_pages_merge_timeline_and_read_time_posts(self):
+        popular = User.objects.create_user(
+            username='popular', password='testpass123')
+        self.follow(self.author)
+        self.follow(popular)
+        Profile.objects.filter(owner=popular).update(followers_count=5)
+        posts = [
+            self.post_as(user, f'Run {i}')
+            for i in range(3) for user in (self.author, popular)
+        ]
+        newest_first = [post.id for post in reversed(posts)]
+
+        seen = []
+        url = '/posts/feed/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, newest_first)
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            newest_first[2:4])
@@ -3,4 +3,7 @@ from workoutposts import views
 
 urlpatterns = [
     path('', views.WorkoutPostList.as_view(), name='workoutpost-list'),
+    path('search/', views.WorkoutPostSearch.as_view(),
+         name='workoutpost-search'),
+    path('feed/', views.HomeFeed.as_view(), name='workoutpost-feed'),
 ]
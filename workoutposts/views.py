@@ -1,29 +1,75 @@
 from rest_framework import generics, permissions
-from django.db.models import Count
-from .models import WorkoutPost
+from .feed import home_feed
+from .models import WorkoutPost, post_search
 from .serializers import WorkoutPostSerializer
+from fitapi.cache import CachedResponseMixin
+from fitapi.conditional import ConditionalGetMixin
+from fitapi.pagination import SearchPagination
 from fitapi.permissions import IsOwnerOrReadOnly
+from fitapi.projections import ProjectedListMixin
+from fitapi.query_plans import QueryPlanMixin
+from fitapi.search import get_search_text
 
 
-class WorkoutPostList(generics.ListCreateAPIView):
+class WorkoutPostList(ConditionalGetMixin, CachedResponseMixin,
+                      ProjectedListMixin, QueryPlanMixin,
+                      generics.ListCreateAPIView):
     serializer_class = WorkoutPostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_cache_tags(self):
+        # Which posts a page shows only changes when posts come or go
+        return ['posts']
+
+    def get_cache_dependencies(self, data):
+        return [
+            tag for row in self.page_rows
+            for tag in (f"post:{row['pk']}", f"profile:{row['owner']}")
+        ]
+
+    def paginate_queryset(self, queryset):
+        # The projected rows carry the owner ids the data does not
+        self.page_rows = super().paginate_queryset(queryset)
+        return self.page_rows
+
     def get_queryset(self):
-        queryset = WorkoutPost.objects.annotate(
-            likes_count=Count('likes', distinct=True),
-            comments_count=Count('comments', distinct=True)
-        ).order_by('-created_at')
-        return queryset
+        return WorkoutPost.objects.order_by('-created_at')
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class WorkoutPostDetail(generics.RetrieveUpdateDestroyAPIView):
+class HomeFeed(ProjectedListMixin, QueryPlanMixin, generics.ListAPIView):
+    """Posts by the users the requesting user follows, newest first."""
+    serializer_class = WorkoutPostSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # Each source of the feed is only read as far as this page reaches
+        offset, reverse, position = (
+            self.paginator.decode_cursor(self.request) or (0, False, None)
+        )
+        return home_feed(
+            self.request.user,
+            offset + self.paginator.get_page_size(self.request) + 1,
+            position, reverse,
+        )
+
+
+class WorkoutPostSearch(ProjectedListMixin, QueryPlanMixin,
+                        generics.ListAPIView):
+    """Posts (all of which are public) matching ``q``, best match first."""
+    serializer_class = WorkoutPostSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        return post_search.search(
+            WorkoutPost.objects.all(), get_search_text(self.request)
+        )
+
+
+class WorkoutPostDetail(QueryPlanMixin, generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsOwnerOrReadOnly]
     serializer_class = WorkoutPostSerializer
-    queryset = WorkoutPost.objects.annotate(
-        likes_count=Count('likes', distinct=True),
-        comments_count=Count('comments', distinct=True)
-    )
+    queryset = WorkoutPost.objects.all()
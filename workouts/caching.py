@@ -0,0 +1,16 @@
+from fitapi.cache import invalidate_tags
+from .periods import invalidate_trend_buckets
+
+
+def stats_tag(owner_id):
+    """Cache tag for everything derived from a user's workout log."""
+    return f'workouts:{owner_id}'
+
+
+def invalidate_cached_stats(rows):
+    """
+    Retire every cached statistic derived from ``stats_row()`` tuples: the
+    owners' statistics payloads and the trend buckets the rows fall in.
+    """
+    invalidate_tags(*{stats_tag(row[0]) for row in rows})
+    invalidate_trend_buckets(rows)
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from workouts.stats import rebuild_workout_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user workout statistics rollups from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help="Number of users rebuilt per transaction.",
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help="Only rebuild this user id (may be repeated).",
+        )
+
+    def handle(self, *args, chunk_size, user_ids, **options):
+        users = User.objects.order_by('pk')
+        if user_ids:
+            users = users.filter(pk__in=user_ids)
+
+        rebuilt = 0
+        last_pk = 0
+        while True:
+            chunk = list(
+                users.filter(pk__gt=last_pk)
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+            rebuild_workout_stats(chunk)
+            rebuilt += len(chunk)
+
+        self.stdout.write(f"Rebuilt workout statistics for {rebuilt} user(s).")
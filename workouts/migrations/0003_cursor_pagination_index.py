@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 14:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0002_rename_user_workout_owner_workout_is_published_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['owner', '-date_logged', '-id'], name='workout_owner_logged_idx'),
+        ),
+    ]
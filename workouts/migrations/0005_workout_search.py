@@ -0,0 +1,51 @@
+# Generated by Django 5.1.2 on 2026-10-18 15:09
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE workouts_workout SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(notes, '')), 'B')"
+        )
+        schema_editor.execute(
+            "CREATE INDEX workout_search_idx ON workouts_workout "
+            "USING GIN (search_vector)"
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE workouts_workout_fts USING "
+            "fts5(title, notes, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            "INSERT INTO workouts_workout_fts (rowid, title, notes) "
+            "SELECT id, title, notes FROM workouts_workout"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS workout_search_idx")
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS workouts_workout_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0004_workout_stats_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workout',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,7 +1,16 @@
-from django.db import models
+from collections import defaultdict
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from fitapi.cache import invalidate_tags
+from fitapi.search import SearchIndex
+from .caching import invalidate_cached_stats
 
 
 class Workout(models.Model):
@@ -57,9 +66,207 @@ class Workout(models.Model):
         default=MODERATE
     )
     is_published = models.BooleanField(default=False)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-date_logged']
+        indexes = [
+            models.Index(
+                fields=['owner', '-date_logged', '-id'],
+                name='workout_owner_logged_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.owner}'s {self.title}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(name in field_names for name in STATS_FIELDS):
+            instance._stats_snapshot = instance.stats_row()
+        return instance
+
+    def stats_row(self):
+        """
+        The values the statistics rollups are built from, as a
+        ``(owner_id, date_logged, workout_type, duration)`` tuple.
+        """
+        date_logged = self._meta.get_field('date_logged').to_python(
+            self.date_logged
+        )
+        return (self.owner_id, date_logged, self.workout_type, self.duration)
+
+
+STATS_FIELDS = ('owner_id', 'date_logged', 'workout_type', 'duration')
+
+workout_search = SearchIndex(Workout, {'title': 'A', 'notes': 'B'})
+
+
+class WorkoutStats(models.Model):
+    """
+    Running totals of a user's workouts, maintained incrementally as
+    workouts are saved and deleted.
+    """
+    owner = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='workout_stats',
+        primary_key=True
+    )
+    total_workouts = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.owner}'s workout stats"
+
+
+class WorkoutMonthlyStats(models.Model):
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='workout_monthly_stats'
+    )
+    month = models.DateField()
+    total = models.PositiveIntegerField(default=0)
+    duration = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-month']
+        unique_together = ['owner', 'month']
+
+    def __str__(self):
+        return f"{self.owner}'s workouts in {self.month:%Y-%m}"
+
+
+class WorkoutTypeStats(models.Model):
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='workout_type_stats'
+    )
+    workout_type = models.CharField(
+        max_length=100,
+        choices=Workout.WORKOUT_TYPES
+    )
+    count = models.PositiveIntegerField(default=0)
+    duration = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-count']
+        unique_together = ['owner', 'workout_type']
+
+    def __str__(self):
+        return f"{self.owner}'s {self.workout_type} workouts"
+
+
+def _bump(model, lookup, deltas):
+    """
+    Add ``deltas`` to the rollup row matching ``lookup``, creating it when
+    a positive delta arrives first.
+    """
+    changes = {
+        field: Greatest(F(field) + delta, 0) if delta < 0 else F(field) + delta
+        for field, delta in deltas.items()
+    }
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_workout_stats(rows, sign=1):
+    """
+    Fold ``stats_row()`` tuples into the rollup tables, adding them when
+    ``sign`` is 1 and subtracting them when it is -1. Rows are combined
+    first so a batch costs one UPDATE per affected rollup row. Cached
+    statistics covering the rows are retired right away and again once the
+    change commits, so a reader racing the transaction cannot keep a stale
+    entry alive.
+    """
+    rows = list(rows)
+    totals = defaultdict(lambda: [0, 0])
+    months = defaultdict(lambda: [0, 0])
+    types = defaultdict(lambda: [0, 0])
+    for owner_id, date_logged, workout_type, duration in rows:
+        month = date_logged.replace(day=1)
+        for bucket in (
+            totals[owner_id],
+            months[owner_id, month],
+            types[owner_id, workout_type],
+        ):
+            bucket[0] += sign
+            bucket[1] += sign * duration
+
+    with transaction.atomic():
+        for owner_id, (count, duration) in totals.items():
+            _bump(WorkoutStats, {'owner_id': owner_id}, {
+                'total_workouts': count, 'total_duration': duration,
+            })
+        for (owner_id, month), (count, duration) in months.items():
+            _bump(WorkoutMonthlyStats, {
+                'owner_id': owner_id, 'month': month,
+            }, {'total': count, 'duration': duration})
+        for (owner_id, workout_type), (count, duration) in types.items():
+            _bump(WorkoutTypeStats, {
+                'owner_id': owner_id, 'workout_type': workout_type,
+            }, {'count': count, 'duration': duration})
+        invalidate_cached_stats(rows)
+        transaction.on_commit(lambda: invalidate_cached_stats(rows))
+
+
+@receiver(pre_save, sender=Workout)
+def remember_stats_row(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding or hasattr(instance, '_stats_snapshot'):
+        return
+    previous = Workout.objects.filter(pk=instance.pk).only(*STATS_FIELDS)
+    previous = previous.first()
+    if previous is not None:
+        instance._stats_snapshot = previous.stats_row()
+
+
+@receiver(post_save, sender=Workout)
+def update_stats_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    row = instance.stats_row()
+    previous = None if created else getattr(instance, '_stats_snapshot', None)
+    if previous == row:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            record_workout_stats([previous], sign=-1)
+        record_workout_stats([row])
+    instance._stats_snapshot = row
+
+
+@receiver(post_delete, sender=Workout)
+def update_stats_on_delete(sender, instance, **kwargs):
+    row = getattr(instance, '_stats_snapshot', None) or instance.stats_row()
+    record_workout_stats([row], sign=-1)
+
+
+@receiver([post_save, post_delete], sender=Workout)
+def invalidate_workout_cache(sender, instance, **kwargs):
+    invalidate_tags(f'workout:{instance.pk}')
+
+
+@receiver(post_save, sender=Workout)
+def index_workout(sender, instance, raw, update_fields, **kwargs):
+    if raw or (
+        update_fields is not None
+        and not update_fields.intersection(workout_search.fields)
+    ):
+        return
+    workout_search.refresh([instance.pk])
+
+
+@receiver(post_delete, sender=Workout)
+def unindex_workout(sender, instance, **kwargs):
+    workout_search.remove([instance.pk])
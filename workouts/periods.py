@@ -0,0 +1,40 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def bucket_start(day, granularity):
+    """First day of the ``granularity`` bucket containing ``day``."""
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'week':
+        return day - timezone.timedelta(days=day.weekday())
+    return day
+
+
+def previous_bucket(start, granularity):
+    if granularity == 'month':
+        return (start - timezone.timedelta(days=1)).replace(day=1)
+    if granularity == 'week':
+        return start - timezone.timedelta(days=7)
+    return start - timezone.timedelta(days=1)
+
+
+def trend_cache_key(owner_id, granularity, start):
+    return f'workout-trends:{owner_id}:{granularity}:{start.isoformat()}'
+
+
+def invalidate_trend_buckets(rows):
+    """
+    Drop the cached trend buckets touched by ``stats_row()`` tuples, for
+    every granularity.
+    """
+    keys = {
+        trend_cache_key(owner_id, granularity,
+                        bucket_start(date_logged, granularity))
+        for owner_id, date_logged, _, _ in rows
+        for granularity in GRANULARITIES
+    }
+    if keys:
+        cache.delete_many(list(keys))
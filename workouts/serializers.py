@@ -1,16 +1,22 @@
 from rest_framework import serializers
+from profiles.images import ProfileImageField
 from .models import Workout
 
 class WorkoutSerializer(serializers.ModelSerializer):
     owner = serializers.ReadOnlyField(source='owner.username')
     is_owner = serializers.SerializerMethodField()
     profile_id = serializers.ReadOnlyField(source='owner.profile.id')
-    profile_image = serializers.ReadOnlyField(source='owner.profile.image.url')
+    profile_image = ProfileImageField(source='owner.profile', size='avatar')
+
+    method_field_sources = {'is_owner': 'owner'}
 
     def get_is_owner(self, obj):
         request = self.context['request']
         return request.user == obj.owner
 
+    def row_is_owner(self, row):
+        return self.context['request'].user.pk == row['owner']
+
     class Meta:
         model = Workout
         fields = [
@@ -0,0 +1,170 @@
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from fitapi.cache import get_or_set, invalidate_tags
+from .caching import stats_tag
+from .models import (
+    Workout, WorkoutMonthlyStats, WorkoutStats, WorkoutTypeStats,
+)
+from .periods import invalidate_trend_buckets
+from .streaks import streak_sql
+
+STATS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# One statement for the whole payload: every part is a branch of the union,
+# tagged with its kind. The NULL columns are cast so that PostgreSQL can
+# resolve each column's type across the branches.
+STATISTICS_SQL = """
+WITH {streak_ctes}
+SELECT 'streaks', CAST(NULL AS VARCHAR(100)), CAST(NULL AS DATE),
+       {streak_columns}
+FROM streaks
+UNION ALL
+SELECT 'week', NULL, NULL, COUNT(*), 0
+FROM {workout} WHERE owner_id = %s AND date_logged >= %s
+UNION ALL
+SELECT 'totals', NULL, NULL, total_workouts, total_duration
+FROM {totals} WHERE owner_id = %s
+UNION ALL
+SELECT 'type', workout_type, NULL, {count}, duration
+FROM {types} WHERE owner_id = %s AND {count} > 0
+UNION ALL
+SELECT * FROM (
+    SELECT 'month', NULL, month, total, duration
+    FROM {months} WHERE owner_id = %s AND total > 0
+    ORDER BY month DESC LIMIT 12
+) AS recent_months
+"""
+
+
+def user_statistics(owner_id):
+    """
+    A user's workout statistics: totals, this week's count, streaks and the
+    type and monthly breakdowns.
+
+    The rollup tables, the weekly count and the streaks are read together in
+    one statement, whose workout scans use the owner/date index, and the
+    payload is cached under the user's statistics tag, which any
+    workout write invalidates. The day is part of the key because the weekly
+    count and the streaks depend on it.
+    """
+    today = timezone.localdate()
+    return get_or_set(
+        f'workout-stats:{owner_id}:{today.isoformat()}',
+        [stats_tag(owner_id)],
+        lambda: _build_user_statistics(owner_id, today),
+        timeout=STATS_CACHE_TIMEOUT,
+    )
+
+
+def _build_user_statistics(owner_id, today):
+    qn = connection.ops.quote_name
+    sql, cte_params, streak_params = streak_sql(
+        STATISTICS_SQL, owner_id, today,
+        workout=qn(Workout._meta.db_table),
+        totals=qn(WorkoutStats._meta.db_table),
+        types=qn(WorkoutTypeStats._meta.db_table),
+        months=qn(WorkoutMonthlyStats._meta.db_table),
+        count=qn('count'),
+    )
+    week_start = today - timezone.timedelta(days=7)
+    params = cte_params + streak_params + [
+        owner_id, week_start, owner_id, owner_id, owner_id,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    to_month = WorkoutMonthlyStats._meta.get_field('month').to_python
+    parts = {'totals': (0, 0)}
+    workout_types, monthly_trends = [], []
+    for kind, workout_type, month, count, duration in rows:
+        if kind == 'type':
+            workout_types.append({
+                'workout_type': workout_type,
+                'count': count,
+                'duration': duration,
+            })
+        elif kind == 'month':
+            monthly_trends.append({
+                'month': to_month(month),
+                'total': count,
+                'duration': duration,
+            })
+        else:
+            parts[kind] = (count, duration)
+    workout_types.sort(key=lambda row: -row['count'])
+    monthly_trends.sort(key=lambda row: row['month'], reverse=True)
+
+    longest, current = parts['streaks']
+    total_workouts, total_duration = parts['totals']
+    return {
+        'total_workouts': total_workouts,
+        'workouts_this_week': parts['week'][0],
+        'current_streak': current,
+        'longest_streak': longest,
+        'total_duration': total_duration,
+        'workout_types': workout_types,
+        'monthly_trends': monthly_trends,
+    }
+
+
+def rebuild_workout_stats(owner_ids):
+    """
+    Recompute the statistics rollups for ``owner_ids`` from their workouts,
+    replacing whatever rows they had, and retire what was cached from the
+    drifted state once the rebuild commits.
+    """
+    workouts = Workout.objects.filter(owner_id__in=owner_ids).order_by()
+    with transaction.atomic():
+        for model in (WorkoutStats, WorkoutMonthlyStats, WorkoutTypeStats):
+            model.objects.filter(owner_id__in=owner_ids).delete()
+
+        WorkoutStats.objects.bulk_create(
+            WorkoutStats(
+                owner_id=row['owner'],
+                total_workouts=row['total'],
+                total_duration=row['duration'],
+            )
+            for row in workouts.values('owner').annotate(
+                total=Count('id'), duration=Sum('duration')
+            )
+        )
+        WorkoutMonthlyStats.objects.bulk_create(
+            WorkoutMonthlyStats(
+                owner_id=row['owner'],
+                month=row['month'],
+                total=row['total'],
+                duration=row['duration'],
+            )
+            for row in workouts.annotate(
+                month=TruncMonth('date_logged')
+            ).values('owner', 'month').annotate(
+                total=Count('id'), duration=Sum('duration')
+            )
+        )
+        WorkoutTypeStats.objects.bulk_create(
+            WorkoutTypeStats(
+                owner_id=row['owner'],
+                workout_type=row['workout_type'],
+                count=row['count'],
+                duration=row['duration'],
+            )
+            for row in workouts.values('owner', 'workout_type').annotate(
+                count=Count('id'), duration=Sum('duration')
+            )
+        )
+
+        # Trend buckets are read from the workouts, so the days logged
+        # cover every bucket that can be cached
+        days = [
+            (owner_id, day, None, None) for owner_id, day in
+            workouts.values_list('owner', 'date_logged').distinct()
+        ]
+        transaction.on_commit(lambda: _invalidate_rebuilt(owner_ids, days))
+
+
+def _invalidate_rebuilt(owner_ids, days):
+    invalidate_tags(*(stats_tag(owner_id) for owner_id in owner_ids))
+    invalidate_trend_buckets(days)
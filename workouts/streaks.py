@@ -0,0 +1,69 @@
+from django.db import connection
+from django.utils import timezone
+from .models import Workout
+
+# Day-number expressions: consecutive dates map to consecutive integers.
+DAY_NUMBER = {
+    'postgresql': "({} - DATE '1970-01-01')",
+    'sqlite': "CAST(julianday({}) AS INTEGER)",
+}
+
+# The CTEs end in ``streaks``, from which STREAK_COLUMNS reads the longest
+# and the current streak; they are kept apart so other statements can
+# select them alongside their own rows.
+STREAK_CTES = """
+days AS (
+    SELECT DISTINCT {day} AS day
+    FROM {table}
+    WHERE owner_id = %s AND date_logged <= %s
+),
+islands AS (
+    SELECT day, day - ROW_NUMBER() OVER (ORDER BY day) AS island
+    FROM days
+),
+streaks AS (
+    SELECT MAX(day) AS last_day, COUNT(*) AS length
+    FROM islands
+    GROUP BY island
+)
+"""
+STREAK_COLUMNS = (
+    "COALESCE(MAX(length), 0), "
+    "COALESCE(MAX(CASE WHEN last_day >= {yesterday} THEN length END), 0)"
+)
+STREAK_SQL = 'WITH {streak_ctes} SELECT {streak_columns} FROM streaks'
+
+
+def streak_sql(sql, owner_id, today, **names):
+    """
+    ``sql`` (a template using ``{streak_ctes}``, ``{streak_columns}`` and
+    any other ``names``) filled in for the database in use, with the
+    parameters of the CTEs and of the columns.
+    """
+    day = DAY_NUMBER[connection.vendor]
+    filled = sql.format(
+        streak_ctes=STREAK_CTES.format(
+            day=day.format('date_logged'),
+            table=connection.ops.quote_name(Workout._meta.db_table),
+        ),
+        streak_columns=STREAK_COLUMNS.format(yesterday=day.format('%s')),
+        **names,
+    )
+    return filled, [owner_id, today], [today - timezone.timedelta(days=1)]
+
+
+def get_streaks(owner_id, today=None):
+    """
+    Return the user's current and longest workout streaks in days.
+
+    Runs the gaps-and-islands query in the database: logged dates are made
+    distinct, and each run of consecutive days shares ``day - row_number``.
+    The current streak is the run that reaches today or yesterday, so it
+    stays alive until a full day is missed.
+    """
+    today = today or timezone.localdate()
+    sql, cte_params, column_params = streak_sql(STREAK_SQL, owner_id, today)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, cte_params + column_params)
+        longest, current = cursor.fetchone()
+    return {'current_streak': current, 'longest_streak': longest}
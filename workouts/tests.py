@@ -1,10 +1,25 @@
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from django.urls import reverse
-from workouts.models import Workout
+from django.core.cache import cache
+from django.core.management import call_command
+from io import BytesIO, StringIO
+from workouts.streaks import get_streaks
+from workouts.transfer import import_workouts, read_records
+from workouts.trends import workout_trends
+from workouts.models import (
+    Workout, WorkoutMonthlyStats, WorkoutStats, WorkoutTypeStats,
+)
 from django.utils import timezone
+from django.utils.http import http_date
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from datetime import date
+import csv
+import gzip
 import json
+import time
 
 class WorkoutTests(APITestCase):
     def setUp(self):
@@ -60,8 +75,8 @@ class WorkoutTests(APITestCase):
         """Test listing workouts"""
         response = self.client.get(reverse('workout-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['title'], 'Morning Run')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['title'], 'Morning Run')
 
     def test_get_workout_detail(self):
         """Test retrieving a specific workout"""
@@ -164,8 +179,337 @@ class WorkoutTests(APITestCase):
         # Test filtering by workout type
         response = self.client.get(f"{reverse('workout-list')}?workout_type=cardio")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['workout_type'], 'cardio')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['workout_type'], 'cardio')
+
+    def test_list_query_count_is_constant(self):
+        """Test listing workouts does not query per row"""
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(reverse('workout-list'))
+        for i in range(5):
+            Workout.objects.create(
+                owner=self.user,
+                title=f"Workout {i}",
+                workout_type="strength",
+                duration=20
+            )
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('workout-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(many), len(single))
+
+    def test_list_conditional_get(self):
+        """Test unchanged workout lists answer 304 until a workout changes"""
+        url = reverse('workout-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        Workout.objects.filter(pk=self.workout.pk).update(
+            duration=45, updated_at=timezone.now())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_deletion_is_not_modified_since(self):
+        """Test deleting a workout is never answered 304 by date"""
+        url = reverse('workout-list')
+        older = Workout.objects.create(
+            owner=self.user, title='Older', workout_type='cardio',
+            duration=20, date_logged=date(2020, 1, 1),
+        )
+        response = self.client.get(url)
+        etag = response['ETag']
+        since = http_date(time.time() + 60)
+
+        older.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=since, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stats_rollup_tracks_edits(self):
+        """Test the statistics rollups follow create, edit and delete"""
+        stats = WorkoutStats.objects.get(owner=self.user)
+        self.assertEqual(stats.total_workouts, 1)
+        self.assertEqual(stats.total_duration, 30)
+
+        self.workout.workout_type = 'strength'
+        self.workout.duration = 50
+        self.workout.save()
+        stats.refresh_from_db()
+        self.assertEqual(stats.total_duration, 50)
+        types = dict(
+            WorkoutTypeStats.objects.filter(owner=self.user)
+            .values_list('workout_type', 'count')
+        )
+        self.assertEqual(types, {'cardio': 0, 'strength': 1})
+
+        self.workout.delete()
+        stats.refresh_from_db()
+        self.assertEqual(stats.total_workouts, 0)
+        self.assertEqual(stats.total_duration, 0)
+        self.assertFalse(
+            WorkoutMonthlyStats.objects.filter(owner=self.user, total__gt=0)
+            .exists()
+        )
+
+    def test_rebuild_workout_stats(self):
+        """Test the rebuild command restores drifted rollups"""
+        WorkoutStats.objects.filter(owner=self.user).update(total_workouts=9)
+        WorkoutTypeStats.objects.all().delete()
+        response = self.client.get(reverse('workout-statistics'))
+        self.assertEqual(response.data['total_workouts'], 9)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'rebuild_workout_stats', chunk_size=1, stdout=StringIO()
+            )
+        response = self.client.get(reverse('workout-statistics'))
+        self.assertEqual(response.data['total_workouts'], 1)
+        stats = WorkoutStats.objects.get(owner=self.user)
+        self.assertEqual(stats.total_workouts, 1)
+        self.assertEqual(
+            WorkoutTypeStats.objects.get(owner=self.user).workout_type, 'cardio'
+        )
+        self.assertFalse(WorkoutStats.objects.filter(owner=self.other_user).exists())
+
+    def test_streaks(self):
+        """Test streaks count distinct consecutive days"""
+        today = timezone.localdate()
+        for days_ago in (0, 0, 1, 2, 5, 6, 7, 8):
+            Workout.objects.create(
+                owner=self.user,
+                title="Streak",
+                workout_type="cardio",
+                duration=10,
+                date_logged=today - timezone.timedelta(days=days_ago)
+            )
+        streaks = get_streaks(self.user.pk, today=today)
+        self.assertEqual(streaks['current_streak'], 3)
+        self.assertEqual(streaks['longest_streak'], 4)
+
+        later = today + timezone.timedelta(days=3)
+        self.assertEqual(get_streaks(self.user.pk, today=later), {
+            'current_streak': 0, 'longest_streak': 4,
+        })
+        self.assertEqual(get_streaks(self.other_user.pk), {
+            'current_streak': 0, 'longest_streak': 0,
+        })
+
+    def test_statistics_trends_granularity(self):
+        """Test the statistics endpoint buckets trends by granularity"""
+        response = self.client.get(
+            reverse('workout-statistics'), {'granularity': 'week', 'periods': 4}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['granularity'], 'week')
+        self.assertEqual(len(response.data['trends']), 4)
+        self.assertEqual(response.data['trends'][0]['total'], 1)
+        self.assertEqual(response.data['trends'][0]['duration'], 30)
+
+        response = self.client.get(
+            reverse('workout-statistics'), {'granularity': 'year'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_closed_trend_buckets_are_cached(self):
+        """Test past buckets are cached until a workout in them changes"""
+        cache.clear()
+        today = timezone.localdate()
+        past = Workout.objects.create(
+            owner=self.user,
+            title="Three days ago",
+            workout_type="cardio",
+            duration=20,
+            date_logged=today - timezone.timedelta(days=3)
+        )
+        trends = workout_trends(self.user.pk, 'day', 5, today=today)
+        self.assertEqual(trends[3]['total'], 1)
+
+        # Bypasses signals, so only the cache can explain the old value
+        Workout.objects.filter(pk=past.pk).update(duration=99)
+        trends = workout_trends(self.user.pk, 'day', 5, today=today)
+        self.assertEqual(trends[3]['duration'], 20)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            past.duration = 45
+            past.save()
+        trends = workout_trends(self.user.pk, 'day', 5, today=today)
+        self.assertEqual(trends[3]['duration'], 45)
+
+    def test_bulk_import_csv(self):
+        """Test CSV import inserts valid rows and reports invalid ones"""
+        body = (
+            "title,workout_type,date_logged,duration,intensity,notes\n"
+            "Long run,cardio,2024-03-01,90,high,\n"
+            "Too long,cardio,2024-03-02,2000,low,\n"
+            "Yoga,flexibility,2024-03-03,30,,\"Slow, easy\"\n"
+            "Mystery,juggling,2024-03-04,10,low,\n"
+        )
+        response = self.client.post(
+            reverse('workout-import'), body, content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual(
+            [(error['row'], list(error['errors'])) for error in response.data['errors']],
+            [(2, ['duration']), (4, ['workout_type'])]
+        )
+        yoga = Workout.objects.get(owner=self.user, title='Yoga')
+        self.assertEqual(yoga.notes, 'Slow, easy')
+        self.assertEqual(yoga.intensity, Workout.MODERATE)
+
+        stats = WorkoutStats.objects.get(owner=self.user)
+        self.assertEqual(stats.total_workouts, 3)
+        self.assertEqual(stats.total_duration, 150)
+
+    def test_bulk_import_ndjson_in_batches(self):
+        """Test NDJSON import updates statistics once per batch"""
+        lines = [
+            json.dumps({"title": f"Run {i}", "workout_type": "cardio",
+                        "duration": 10, "date_logged": "2024-01-15"})
+            for i in range(5)
+        ] + ['not json']
+        records = read_records(
+            BytesIO('\n'.join(lines).encode()), 'application/x-ndjson'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = import_workouts(self.user, records, batch_size=2)
+        self.assertEqual(result['created'], 5)
+        self.assertEqual(result['errors'][0]['row'], 6)
+        inserts = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('INSERT INTO "workouts_workout"')
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(
+            WorkoutMonthlyStats.objects.get(
+                owner=self.user, month='2024-01-01').total, 5
+        )
+
+    def test_bulk_import_reports_unparseable_values(self):
+        """Test non-text NDJSON values and undecodable bodies are row errors"""
+        lines = [
+            {"title": "Numeric date", "workout_type": "cardio",
+             "duration": 10, "date_logged": 20240101},
+            {"title": "List date", "workout_type": "cardio",
+             "duration": 10, "date_logged": [1]},
+            {"title": "Fine", "workout_type": "cardio",
+             "duration": 10, "date_logged": "2024-01-15"},
+        ]
+        response = self.client.post(
+            reverse('workout-import'),
+            '\n'.join(json.dumps(line) for line in lines),
+            content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            [(error['row'], list(error['errors'])) for error in response.data['errors']],
+            [(2, ['date_logged'])]
+        )
+        self.assertEqual(
+            Workout.objects.get(title='Numeric date').date_logged,
+            date(2024, 1, 1)
+        )
+
+        body = (
+            "title,workout_type,date_logged,duration\n"
+            "Swim,sports,2024-03-01,20\n"
+        ).encode() + b"Bad \xff\xfe,cardio,2024-03-02,20\n"
+        response = self.client.post(
+            reverse('workout-import'), body, content_type='text/csv'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+
+    def test_bulk_import_rejects_unknown_content_type(self):
+        """Test import only accepts CSV and NDJSON bodies"""
+        response = self.client.post(
+            reverse('workout-import'), [], format='json'
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_export_streams_csv_and_ndjson(self):
+        """Test export streams the user's workouts within a date range"""
+        Workout.objects.create(
+            owner=self.user, title="Old", workout_type="cardio",
+            duration=15, date_logged="2023-06-01"
+        )
+        Workout.objects.create(
+            owner=self.other_user, title="Not mine", workout_type="cardio",
+            duration=15, date_logged="2023-06-01"
+        )
+        response = self.client.get(reverse('workout-export'))
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(
+            b''.join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual([row['title'] for row in rows], ['Old', 'Morning Run'])
+
+        response = self.client.get(reverse('workout-export'), {
+            'output': 'ndjson', 'date_to': '2023-12-31',
+            'compression': 'gzip',
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['date_logged'], '2023-06-01')
+
+        response = self.client.get(
+            reverse('workout-export'), {'date_from': '2023-02-30'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_ranks_own_workouts(self):
+        """Test search matches title and notes of the user's own workouts"""
+        hills = Workout.objects.create(
+            owner=self.user, title="Hill sprints", workout_type="cardio",
+            duration=20, notes="Running uphill"
+        )
+        Workout.objects.create(
+            owner=self.other_user, title="Hill run", workout_type="cardio",
+            duration=20
+        )
+        url = reverse('workout-search')
+        response = self.client.get(url, {'q': 'runs'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [self.workout.id, hills.id]
+        )
+        self.assertEqual(response.data['count'], 2)
+
+        hills.notes = ''
+        hills.save()
+        self.workout.delete()
+        response = self.client.get(url, {'q': 'runs'})
+        self.assertEqual(response.data['results'], [])
+
+        self.client.post(
+            reverse('workout-import'),
+            'title,workout_type,duration\nEvening run,cardio,25\n',
+            content_type='text/csv'
+        )
+        response = self.client.get(url, {'q': 'evening "run'})
+        self.assertEqual(len(response.data['results']), 1)
+
+        response = self.client.get(url, {'q': ' '})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def tearDown(self):
         """Clean up after tests"""
@@ -0,0 +1,183 @@
+"""
+Bulk import and streaming export of workouts as CSV or NDJSON.
+"""
+import codecs
+import csv
+import io
+import json
+import zlib
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from .models import Workout, record_workout_stats, workout_search
+
+IMPORT_FIELDS = (
+    'title', 'workout_type', 'date_logged', 'duration', 'intensity', 'notes',
+)
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+EXPORT_FIELDS = (
+    'id', 'title', 'workout_type', 'date_logged', 'duration', 'intensity',
+    'notes', 'created_at', 'updated_at',
+)
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_TYPES = ('text/csv',)
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl')
+
+
+def _csv_records(lines):
+    reader = csv.DictReader(lines)
+    for number, record in enumerate(reader, start=1):
+        yield number, record
+
+
+def _ndjson_records(lines):
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            yield number, ValidationError('Each line must be a JSON object.')
+        else:
+            yield number, record
+
+
+def _until_unreadable(records):
+    # Nothing after text that is not UTF-8 (or not CSV) can be trusted, so
+    # reading stops there with an error for the row it broke
+    number = 0
+    try:
+        for number, record in records:
+            yield number, record
+    except (UnicodeDecodeError, csv.Error):
+        yield number + 1, ValidationError(
+            'The file could not be read past this row: it is not valid '
+            'UTF-8 text in the declared format.'
+        )
+
+
+def read_records(stream, content_type):
+    """
+    Yield ``(row number, record)`` pairs decoded from a byte stream, one
+    line at a time. A record that cannot be decoded is yielded as a
+    ``ValidationError``, as is the first row of a body that stops being
+    readable, after which nothing more is read. Returns ``None`` for an
+    unsupported content type.
+    """
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    if content_type in CSV_TYPES:
+        return _until_unreadable(_csv_records(lines))
+    if content_type in NDJSON_TYPES:
+        return _until_unreadable(_ndjson_records(lines))
+    return None
+
+
+def build_workout(owner, record):
+    """
+    A validated, unsaved ``Workout`` from an import record. Missing or
+    empty values fall back to the model defaults; numbers and booleans
+    (from NDJSON) are validated as their text, and lists or objects are
+    rejected.
+    """
+    values = {}
+    invalid = {}
+    for field, value in record.items():
+        if field not in IMPORT_FIELDS or value in ('', None):
+            continue
+        if isinstance(value, (list, dict)):
+            invalid[field] = ['Expected a single value.']
+        else:
+            values[field] = value if isinstance(value, str) else str(value)
+    if invalid:
+        raise ValidationError(invalid)
+    workout = Workout(owner=owner, **values)
+    workout.full_clean(exclude=['owner'], validate_unique=False)
+    return workout
+
+
+def _save_batch(workouts):
+    with transaction.atomic():
+        Workout.objects.bulk_create(workouts)
+        record_workout_stats(workout.stats_row() for workout in workouts)
+        workout_search.refresh(workout.pk for workout in workouts)
+
+
+def import_workouts(owner, records, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Validate and insert ``records`` for ``owner``, ``batch_size`` rows per
+    transaction, updating the statistics rollups once per batch.
+
+    Invalid rows are skipped and reported; valid rows are kept even when
+    others fail. Returns a summary with the ``created`` and ``failed``
+    counts and up to ``MAX_REPORTED_ERRORS`` ``{'row': ..., 'errors': ...}``
+    entries in ``errors``.
+    """
+    created = failed = 0
+    errors = []
+    batch = []
+    for number, record in records:
+        try:
+            if isinstance(record, ValidationError):
+                raise record
+            batch.append(build_workout(owner, record))
+        except (ValidationError, TypeError, ValueError) as error:
+            # Field cleaning may also fail outright on a value it was not
+            # written for, which is still just a bad row
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                if isinstance(error, ValidationError):
+                    detail = (
+                        error.message_dict if hasattr(error, 'error_dict')
+                        else {'non_field_errors': error.messages}
+                    )
+                else:
+                    detail = {'non_field_errors': ['Invalid values.']}
+                errors.append({'row': number, 'errors': detail})
+        if len(batch) >= batch_size:
+            _save_batch(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        _save_batch(batch)
+        created += len(batch)
+    return {'created': created, 'failed': failed, 'errors': errors}
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Stream ``EXPORT_FIELDS`` of ``queryset`` as dicts, fetched
+    ``chunk_size`` rows at a time without building model instances.
+    """
+    return queryset.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def gzip_chunks(chunks):
+    """Compress text ``chunks`` into a gzip stream as they are produced."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
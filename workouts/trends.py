@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+from .models import Workout
+from .periods import bucket_start, previous_bucket, trend_cache_key
+
+TRUNCATE = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+DEFAULT_PERIODS = {'day': 30, 'week': 12, 'month': 12}
+MAX_PERIODS = 366
+CLOSED_BUCKET_TIMEOUT = 60 * 60 * 24 * 30
+
+
+def workout_trends(owner_id, granularity='month', periods=None, today=None):
+    """
+    Workout count and duration per ``granularity`` bucket for the last
+    ``periods`` buckets, newest first, including empty buckets.
+
+    Only the requested date range is scanned, so the ``(owner,
+    date_logged)`` index bounds the query. Closed buckets (everything
+    before the current one) are cached until a workout inside them changes.
+    The current bucket is always computed fresh.
+    """
+    today = today or timezone.localdate()
+    periods = periods or DEFAULT_PERIODS[granularity]
+
+    starts = [bucket_start(today, granularity)]
+    for _ in range(periods - 1):
+        starts.append(previous_bucket(starts[-1], granularity))
+    keys = {
+        start: trend_cache_key(owner_id, granularity, start)
+        for start in starts[1:]
+    }
+
+    cached = cache.get_many(list(keys.values()))
+    buckets = {
+        start: cached[key] for start, key in keys.items() if key in cached
+    }
+    missing = [start for start in keys if start not in buckets]
+    query_from = missing[-1] if missing else starts[0]
+
+    rows = (
+        Workout.objects
+        .filter(
+            owner_id=owner_id,
+            date_logged__gte=query_from,
+            date_logged__lte=today,
+        )
+        .annotate(period=TRUNCATE[granularity]('date_logged'))
+        .order_by()
+        .values('period')
+        .annotate(total=Count('id'), duration=Sum('duration'))
+    )
+    fresh = {row['period']: (row['total'], row['duration']) for row in rows}
+    buckets[starts[0]] = fresh.get(starts[0], (0, 0))
+    if missing:
+        computed = {start: fresh.get(start, (0, 0)) for start in missing}
+        buckets.update(computed)
+        cache.set_many(
+            {keys[start]: value for start, value in computed.items()},
+            timeout=CLOSED_BUCKET_TIMEOUT,
+        )
+
+    return [
+        {'period': start, 'total': buckets[start][0],
+         'duration': buckets[start][1]}
+        for start in starts
+    ]
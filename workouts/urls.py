@@ -4,5 +4,8 @@ from . import views
 urlpatterns = [
     path('', views.WorkoutList.as_view(), name='workout-list'),
     path('<int:pk>/', views.WorkoutDetail.as_view(), name='workout-detail'),
+    path('search/', views.WorkoutSearch.as_view(), name='workout-search'),
+    path('export/', views.workout_export, name='workout-export'),
+    path('import/', views.WorkoutImport.as_view(), name='workout-import'),
     path('statistics/', views.workout_statistics, name='workout-statistics'),
 ]
\ No newline at end of file
@@ -1,18 +1,35 @@
-from django.db.models import Count, Sum
-from django.utils import timezone
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from .models import Workout
+from rest_framework.views import APIView
+from .models import Workout, workout_search
 from .serializers import WorkoutSerializer
+from .periods import GRANULARITIES
+from .stats import user_statistics
+from .transfer import (
+    csv_lines, export_rows, gzip_chunks, import_workouts, ndjson_lines,
+    read_records,
+)
+from .trends import MAX_PERIODS, workout_trends
+from fitapi.cache import CachedResponseMixin
+from fitapi.conditional import ConditionalGetMixin
+from fitapi.pagination import DateLoggedCursorPagination, SearchPagination
+from fitapi.projections import ProjectedListMixin
 from fitapi.permissions import IsOwnerOrReadOnly
-import logging
+from fitapi.query_plans import QueryPlanMixin
+from fitapi.search import get_search_text
 
-logger = logging.getLogger(__name__)
-
-class WorkoutList(generics.ListCreateAPIView):
+class WorkoutList(ConditionalGetMixin, ProjectedListMixin, QueryPlanMixin,
+                  generics.ListCreateAPIView):
     serializer_class = WorkoutSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DateLoggedCursorPagination
+    validator_fields = (
+        'updated_at', 'owner__username', 'owner__profile__image',
+        'owner__profile__updated_at',
+    )
 
     def get_queryset(self):
         """
@@ -26,7 +43,23 @@ class WorkoutList(generics.ListCreateAPIView):
         """
         serializer.save(owner=self.request.user)
 
-class WorkoutDetail(generics.RetrieveUpdateDestroyAPIView):
+class WorkoutSearch(ProjectedListMixin, QueryPlanMixin, generics.ListAPIView):
+    """
+    The authenticated user's workouts matching ``q`` in their title or
+    notes, best match first.
+    """
+    serializer_class = WorkoutSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        return workout_search.search(
+            Workout.objects.filter(owner=self.request.user),
+            get_search_text(self.request)
+        )
+
+class WorkoutDetail(ConditionalGetMixin, CachedResponseMixin, QueryPlanMixin,
+                    generics.RetrieveUpdateDestroyAPIView):
     """
     API view to retrieve, update, or delete a specific workout.
     Only the owner can update or delete.
@@ -40,73 +73,127 @@ class WorkoutDetail(generics.RetrieveUpdateDestroyAPIView):
         """
         return Workout.objects.all()
 
+    def get_cache_tags(self):
+        return [f"workout:{self.kwargs['pk']}"]
+
+    def get_cache_dependencies(self, data):
+        return [f'profile:{self.object.owner_id}']
+
+    def get_object(self):
+        self.object = super().get_object()
+        return self.object
+
+
+class WorkoutImport(APIView):
+    """
+    Import workouts in bulk from a CSV (``text/csv``, with a header row) or
+    NDJSON (``application/x-ndjson``) request body. The body is read as a
+    stream and inserted in batches; rows that fail validation are skipped
+    and reported by row number.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        content_type = request.content_type.split(';')[0].strip()
+        records = read_records(request.stream or [], content_type)
+        if records is None:
+            return Response(
+                {'detail': 'Send text/csv or application/x-ndjson.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        result = import_workouts(request.user, records)
+        if result['failed'] and not result['created']:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+}
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def workout_export(request):
+    """
+    Stream the authenticated user's workout history, oldest first.
+
+    ``output`` picks ``csv`` (the default) or ``ndjson``, ``date_from`` and
+    ``date_to`` (YYYY-MM-DD, inclusive) limit the range and
+    ``compression=gzip`` gzips the file.
+    """
+    params = request.query_params
+    output = params.get('output', 'csv')
+    if output not in EXPORT_FORMATS:
+        return Response(
+            {'output': [f"Choose one of: {', '.join(EXPORT_FORMATS)}."]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    compression = params.get('compression')
+    if compression not in (None, 'gzip'):
+        return Response(
+            {'compression': ['Only gzip is supported.']},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    queryset = Workout.objects.filter(owner=request.user)
+    for param, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+        if params.get(param):
+            try:
+                day = parse_date(params[param])
+            except ValueError:
+                day = None
+            if day is None:
+                return Response(
+                    {param: ['Use the YYYY-MM-DD format.']},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            queryset = queryset.filter(**{f'date_logged__{lookup}': day})
+
+    render, content_type = EXPORT_FORMATS[output]
+    chunks = render(export_rows(queryset.order_by('date_logged', 'pk')))
+    filename = f'workouts.{output}'
+    if compression:
+        chunks = gzip_chunks(chunks)
+        content_type = 'application/gzip'
+        filename += '.gz'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def workout_statistics(request):
     """
     Provide statistics for the authenticated user's workouts.
-    Statistics include total workouts, weekly workouts, current streak,
+    Statistics include total workouts, weekly workouts, current and longest streaks,
     total duration, workout types distribution, and monthly trends.
+
+    Passing ``granularity`` (day, week or month) and optionally ``periods``
+    adds a ``trends`` series bucketed at that granularity.
     """
-    try:
-        workouts = Workout.objects.filter(owner=request.user)
-
-        # Calculate total workouts and duration
-        total_workouts = workouts.count()
-        total_duration = workouts.aggregate(Sum('duration'))['duration__sum'] or 0
-
-        # Calculate weekly workouts
-        week_start = timezone.now().date() - timezone.timedelta(days=7)
-        workouts_this_week = workouts.filter(date_logged__gte=week_start).count()
-
-        # Calculate current streak
-        streak = 0
-        if total_workouts > 0:
-            dates = workouts.values_list('date_logged', flat=True).order_by('-date_logged')
-            current_date = dates[0]
-            streak = 1
-            for date in dates[1:]:
-                if (current_date - date).days == 1:
-                    streak += 1
-                    current_date = date
-                else:
-                    break
-
-        # Aggregate workout types
-        workout_types = workouts.values('workout_type').annotate(
-            count=Count('id')
-        ).order_by('-count')
-
-        # Aggregate monthly statistics
-        monthly_stats = workouts.extra(
-            select={'month': "DATE_TRUNC('month', date_logged)"}
-        ).values('month').annotate(
-            total=Count('id'),
-            duration=Sum('duration')
-        ).order_by('-month')[:12]
-
-        # Compile statistics
-        stats = {
-            'total_workouts': total_workouts,
-            'workouts_this_week': workouts_this_week,
-            'current_streak': streak,
-            'total_duration': total_duration,
-            'workout_types': list(workout_types),
-            'monthly_trends': list(monthly_stats),
-        }
-
-        return Response(stats)
-    except Exception as e:
-        logger.error(f"Error in workout_statistics: {str(e)}")
-        return Response(
-            {
-                'total_workouts': 0,
-                'workouts_this_week': 0,
-                'current_streak': 0,
-                'total_duration': 0,
-                'workout_types': [],
-                'monthly_trends': [],
-            },
-            status=status.HTTP_200_OK
+    stats = dict(user_statistics(request.user.pk))
+
+    granularity = request.query_params.get('granularity')
+    if granularity:
+        if granularity not in GRANULARITIES:
+            return Response(
+                {'granularity': [f"Choose one of: {', '.join(GRANULARITIES)}."]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        periods = request.query_params.get('periods')
+        if periods is not None:
+            if not periods.isdigit() or not 1 <= int(periods) <= MAX_PERIODS:
+                return Response(
+                    {'periods': [f"Must be between 1 and {MAX_PERIODS}."]},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            periods = int(periods)
+        stats['granularity'] = granularity
+        stats['trends'] = workout_trends(
+            request.user.pk, granularity, periods
         )
+
+    return Response(stats)